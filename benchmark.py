@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import ratsstats
+from crawler import fetch_concurrently, CrawlScheduler, DEFAULT_WORKERS
+from mock_ratsstats import MockRatsServer, load_fixtures, synthetic_fixtures, fixtures_file_path
+from sinks import CsvSink, DeltaSink, ParquetSink, UpsertSink, SqliteTable, pa
+from sqlite_store import SqliteStore
+from stats_schema import StatsSchema
+
+# Where results are written by default
+results_file_path = './bench/results.json'
+
+# Crawl date stamped on benchmark rows
+bench_date = '01012030'
+
+# Function to get the nearest-rank percentile `q` (0-100) of sorted values
+def percentile(values, q):
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values) + 0.5) - 1))]
+
+# Function to get the peak resident set size of this process so far, in MB
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+# Function to summarize one stage: throughput, per-uid latency percentiles and peak RSS
+def summarize(rows, seconds, latencies=()):
+    latencies = sorted(latencies)
+    result = {'rows': rows, 'seconds': round(seconds, 4), 'rows_per_sec': round(rows / seconds, 1) if seconds else None}
+    for q in (50, 95, 99):
+        value = percentile(latencies, q)
+        result[f'p{q}_ms'] = round(value * 1000, 4) if value is not None else None
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return result
+
+# Function to time `step(item)` over every item, returning (summary, results)
+def timed(items, step):
+    results, latencies = [], []
+    start = time.perf_counter()
+    for item in items:
+        begin = time.perf_counter()
+        results.append(step(item))
+        latencies.append(time.perf_counter() - begin)
+    return summarize(len(results), time.perf_counter() - start, latencies), results
+
+# Stage: fetch every uid from the mock server through the crawler's worker pool
+def bench_fetch(server, uids, fetcher, workers):
+    latencies = []
+
+    def fetch(batch):
+        begin = time.perf_counter()
+        players = fetcher.fetch(batch)
+        latencies.extend([(time.perf_counter() - begin) / len(batch)] * len(batch))
+        return players
+
+    size = fetcher.batch_size
+    batches = [tuple(uids[i:i + size]) for i in range(0, len(uids), size)]
+    scheduler = CrawlScheduler(workers=workers, rate=0)
+    responses = {}
+    before = server.requests
+    start = time.perf_counter()
+    for _, players, error in fetch_concurrently(batches, fetch, scheduler=scheduler):
+        if error is None:
+            responses.update(players)
+    summary = summarize(len(responses), time.perf_counter() - start, latencies)
+    summary['requests'] = server.requests - before
+    summary['retries'] = scheduler.retried
+    return summary, responses
+
+# Stage: run the whole crawl pipeline into a CSV in a scratch directory
+def bench_crawl(uids, fetcher, workers, scratch):
+    import pipeline
+    cwd = os.getcwd()
+    os.chdir(scratch)
+    try:
+        os.makedirs('data', exist_ok=True)
+        with open('data/uniqueuids.txt', 'w') as file:
+            file.write(''.join(f'{uid}\n' for uid in uids))
+        start = time.perf_counter()
+        pipeline.crawl([CsvSink('data/crawl.csv', header=StatsSchema().columns)], 'bench', date=bench_date,
+                       workers=workers, rate=0, full_sweep=True, fetcher=fetcher)
+        return summarize(len(uids), time.perf_counter() - start)
+    finally:
+        os.chdir(cwd)
+
+# Sinks benchmarked on the projected rows, each writing into the scratch directory
+def make_sinks(schema, scratch):
+    sinks = {
+        'csv': lambda: CsvSink(os.path.join(scratch, 'bench.csv'), header=schema.columns),
+        'delta': lambda: DeltaSink(os.path.join(scratch, 'bench.jsonl'), os.path.join(scratch, 'bench_state.json.gz'),
+                                   schema.columns, schema.empty_row, bench_date),
+        'sqlite': lambda: SqliteStore(os.path.join(scratch, 'bench.db'), schema, bench_date),
+        'upsert': lambda: UpsertSink(SqliteTable(os.path.join(scratch, 'bench_upsert.db')), columns=schema.legacy_columns),
+    }
+    if pa is not None:
+        sinks['parquet'] = lambda: ParquetSink(os.path.join(scratch, 'parquet'), schema.columns, bench_date)
+    return sinks
+
+# Stage: write the projected rows to one sink; the close (final flush) is part of the time
+def bench_sink(factory, rows, uid_index):
+    sink = factory().open()
+    latencies = []
+    start = time.perf_counter()
+    for row in rows:
+        begin = time.perf_counter()
+        sink.write(row, key=row[uid_index])
+        latencies.append(time.perf_counter() - begin)
+    sink.close()
+    return summarize(len(rows), time.perf_counter() - start, latencies)
+
+# Run every stage once over the fixtures and return the results
+def run(fixtures, fetch='single', workers=DEFAULT_WORKERS, latency=0.0, error_rate=0.0, sinks=None):
+    schema = StatsSchema()
+    uids = sorted(fixtures['players'])
+    results = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'players': len(uids),
+        'fetch': fetch,
+        'workers': workers,
+        'latency': latency,
+        'error_rate': error_rate,
+        'stages': {},
+    }
+    stages = results['stages']
+    scratch = tempfile.mkdtemp(prefix='wbtsdb-bench-')
+    try:
+        with MockRatsServer(fixtures, latency=latency, error_rate=error_rate, seed=0) as server:
+            ratsstats.player_list_url = server.url + '/get_player_list.php?squad=true'
+            ratsstats.player_info_url = server.url + '/get_player_stats.php?uid={}'
+            ratsstats.player_bulk_url = server.url + '/get_player_stats.php?uids={}'
+            fetcher = ratsstats.make_fetcher(fetch)
+
+            stages['fetch'], responses = bench_fetch(server, uids, fetcher, workers)
+            stages['crawl'] = bench_crawl(uids, fetcher, workers, scratch)
+            ratsstats.close_session()
+
+        # Decode the raw bodies again off the network, then flatten them into rows
+        bodies = [json.dumps(responses[uid]) for uid in uids if uid in responses]
+        stages['decode'], decoded = timed(bodies, json.loads)
+        stages['project'], rows = timed(decoded, lambda player: schema.project(bench_date, player['uid'], player))
+
+        for name, factory in make_sinks(schema, scratch).items():
+            if sinks is None or name in sinks:
+                stages[f'sink_{name}'] = bench_sink(factory, rows, schema.uid_index)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+# Function to print the results next to a baseline run, as a rows/sec ratio
+def print_results(results, baseline=None):
+    base = (baseline or {}).get('stages', {})
+    print(f"{'stage':<14}{'rows/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'RSS MB':>9}"
+          + (f"{'vs base':>9}" if base else ''))
+    for name, stage in results['stages'].items():
+        cells = [stage['rows_per_sec'], stage['p50_ms'], stage['p95_ms'], stage['p99_ms'], stage['peak_rss_mb']]
+        line = f"{name:<14}" + ''.join(f"{'-' if cell is None else cell:>{width}}"
+                                         for cell, width in zip(cells, (12, 10, 10, 10, 9)))
+        old = base.get(name, {}).get('rows_per_sec')
+        if old and stage['rows_per_sec']:
+            line += f"{stage['rows_per_sec'] / old:>8.2f}x"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the crawl pipeline stages against the local mock server")
+    parser.add_argument('--fixtures', default=fixtures_file_path,
+                        help="recorded get_player_stats.php responses to replay (see mock_ratsstats.py --record)")
+    parser.add_argument('--synthetic', type=int, metavar='N', help="replay N generated players instead of fixtures")
+    parser.add_argument('--fetch', default='single', help="fetch strategy: single, bulk or dump:<path>")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds the mock adds to every response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of mock responses that are 503s")
+    parser.add_argument('--sink', dest='sinks', action='append', help="only benchmark these sinks")
+    parser.add_argument('--out', default=results_file_path, help="JSON file to write the results to")
+    parser.add_argument('--baseline', help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    fixtures = synthetic_fixtures(args.synthetic) if args.synthetic else load_fixtures(args.fixtures)
+    results = run(fixtures, fetch=args.fetch, workers=args.workers, latency=args.latency,
+                  error_rate=args.error_rate, sinks=args.sinks)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.out}")
@@ -0,0 +1,179 @@
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import math
+import os
+from datetime import datetime
+
+import numpy as np
+
+from derived_metrics import counter_columns, counter_cube, derive, forward_fill
+from sinks import DATE_FORMAT
+from tsreader import read_csv_columns
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Where the shards are written by default, inside the GitHub Pages site
+shards_dir_path = './wb/shards/'
+
+# Players per shard the shard count is sized for
+TARGET_SHARD_PLAYERS = 16
+
+# Per-player series shipped in the shards: columns from the CSV, then derived metrics
+PLAYER_COLUMNS = ['Level', 'XP', 'KillsELO', 'GamesELO']
+PLAYER_METRICS = ['Kills', 'Deaths', 'KD', 'Accuracy', 'Headshot_Rate', 'Kills_Delta', 'Deaths_Delta']
+
+# Function to get the number of hex characters of a key that spread `count`
+# items over shards of about `target` items each
+def shard_chars(count, target=TARGET_SHARD_PLAYERS):
+    return max(1, math.ceil(math.log(max(count / target, 1), 16)))
+
+# Players are sharded on the last hex characters of their uid (the ObjectId
+# counter, which is evenly spread), squads on the start of the SHA-1 of their
+# name, so a page can work out which file to fetch without a lookup table
+def player_shard(uid, chars):
+    return uid[-chars:].lower()
+
+def squad_shard(squad, chars):
+    return hashlib.sha1(squad.encode()).hexdigest()[:chars]
+
+# Function to turn a float array into a JSON list, None for NaN and rounded floats
+def json_values(values, digits=None):
+    if digits is None:
+        return [None if value != value else int(value) for value in values.tolist()]
+    return [None if value != value else round(value, digits) for value in values.tolist()]
+
+# Function to get the last non-empty text value of each player, e.g. its current squad
+def latest_text(grid):
+    latest = [None] * len(grid)
+    for player, values in enumerate(grid):
+        for value in reversed(values):
+            if value:
+                latest[player] = value
+                break
+    return latest
+
+# Build every player and squad shard as {shard: {key: data}} from the time-series CSV
+def build(csv_path, start=None, end=None):
+    data = read_csv_columns(csv_path, ['Date', 'UserID', 'Squad', 'Name'] + PLAYER_COLUMNS + counter_columns(),
+                            start=start, end=end)
+    cube = counter_cube(data)
+    metrics = {name: values[:, :, 0] for name, values in derive(cube).items() if name in PLAYER_METRICS}
+    columns = {name: cube.grid(data[name]) for name in PLAYER_COLUMNS}
+    crawled = ~np.isnan(metrics['Kills'])
+    dates = np.array([value.strftime(DATE_FORMAT) for value in cube.dates])
+    names, squads = latest_text(cube.grid(data['Name'])), latest_text(cube.grid(data['Squad']))
+
+    # One series per player over the dates it was crawled
+    players = {}
+    for player, uid in enumerate(cube.players):
+        days = crawled[player]
+        series = {'name': names[player], 'squad': squads[player], 'dates': dates[days].tolist()}
+        for name in PLAYER_COLUMNS:
+            series[name] = json_values(columns[name][player, days], 2 if name.endswith('ELO') else None)
+        for name in PLAYER_METRICS:
+            series[name] = json_values(metrics[name][player, days], 4 if name in ('KD', 'Accuracy', 'Headshot_Rate')
+                                       else None)
+        players[uid] = series
+
+    # Squad totals per date count every member with its last crawled values, so
+    # members crawled only weekly or monthly don't make the totals dip
+    kills = forward_fill(cube.counters['kills_per_weapon'])[:, :, 0]
+    deaths = forward_fill(cube.counters['deaths'])[:, :, 0]
+    members = {}
+    for player, squad in enumerate(squads):
+        if squad:
+            members.setdefault(squad, []).append(player)
+    squad_data = {}
+    for squad, rows in members.items():
+        rows = np.array(rows)
+        active = (~np.isnan(kills[rows])).sum(axis=0)
+        days = active > 0
+        squad_data[squad] = {
+            'members': [{'uid': cube.players[player], 'name': names[player],
+                         'Level': players[cube.players[player]]['Level'][-1],
+                         'Kills': players[cube.players[player]]['Kills'][-1],
+                         'KD': players[cube.players[player]]['KD'][-1],
+                         'last': players[cube.players[player]]['dates'][-1]} for player in rows],
+            'dates': dates[days].tolist(),
+            'Members': active[days].tolist(),
+            'Kills': json_values(np.nansum(kills[rows], axis=0)[days]),
+            'Deaths': json_values(np.nansum(deaths[rows], axis=0)[days]),
+        }
+
+    player_chars, squad_chars = shard_chars(len(players)), shard_chars(len(squad_data))
+    shards = {}
+    for uid, series in players.items():
+        shards.setdefault(f'players/{player_shard(uid, player_chars)}', {})[uid] = series
+    for squad, totals in squad_data.items():
+        shards.setdefault(f'squads/{squad_shard(squad, squad_chars)}', {})[squad] = totals
+    layout = {
+        'players': {'count': len(players), 'chars': player_chars, 'key': 'uid_suffix'},
+        'squads': {'count': len(squad_data), 'chars': squad_chars, 'key': 'sha1_prefix'},
+        'dates': dates[[0, -1]].tolist() if len(dates) else [],
+    }
+    return shards, layout
+
+# Function to write `data` to `path` only when it changed, so an unchanged
+# shard keeps its file (and its git history) untouched; returns whether it was written
+def write_if_changed(path, data):
+    if os.path.exists(path):
+        with open(path, 'rb') as file:
+            if file.read() == data:
+                return False
+    with open(path + '.tmp', 'wb') as file:
+        file.write(data)
+    os.replace(path + '.tmp', path)
+    return True
+
+# Write the shards under `out_dir` as <shard>.json with .json.gz (and
+# .json.br when brotli is installed) next to it, plus manifest.json. The
+# manifest stays a few hundred bytes however many players there are: it says
+# how to get from a uid or squad name to its shard, so a page fetches the
+# manifest, then one compressed shard it inflates with DecompressionStream.
+# Shards that no longer exist are removed.
+def write_shards(out_dir, shards, layout):
+    written, total = 0, 0
+    for shard, content in sorted(shards.items()):
+        path = os.path.join(out_dir, shard + '.json')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(content, separators=(',', ':'), sort_keys=True).encode()
+        total += len(data)
+        changed = write_if_changed(path, data)
+        written += changed
+        if changed or not os.path.exists(path + '.gz'):
+            # mtime=0 keeps the gzip bytes the same for the same content
+            write_if_changed(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None and (changed or not os.path.exists(path + '.br')):
+            write_if_changed(path + '.br', brotli.compress(data, quality=11))
+        elif brotli is None and changed and os.path.exists(path + '.br'):
+            # Without brotli a stale variant is dropped rather than left behind
+            os.remove(path + '.br')
+
+    for path in glob.glob(os.path.join(out_dir, '*', '*.json*')):
+        if os.path.relpath(path, out_dir).split('.json')[0] not in shards:
+            os.remove(path)
+
+    manifest = {'generated': datetime.now().isoformat(timespec='seconds'), 'fields': PLAYER_COLUMNS + PLAYER_METRICS,
+                **layout, 'shards': len(shards), 'bytes': total, 'variants': ['gz'] + (['br'] if brotli else [])}
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, separators=(',', ':'))
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the per-player and per-squad JSON shards for the site")
+    parser.add_argument('--csv', default='./data/wbuserdata_ts.csv')
+    parser.add_argument('--out', default=shards_dir_path)
+    parser.add_argument('--start', help="first date, MMDDYYYY")
+    parser.add_argument('--end', help="last date, MMDDYYYY")
+    args = parser.parse_args()
+
+    shards, layout = build(args.csv, args.start, args.end)
+    written = write_shards(args.out, shards, layout)
+    print(f"{layout['players']['count']} players and {layout['squads']['count']} squads in {len(shards)} shards, "
+          f"{written} rewritten under {args.out}")
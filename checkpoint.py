@@ -0,0 +1,84 @@
+import csv
+import os
+
+# Journal of uids already written for one crawl date, so an interrupted run can
+# pick up where it stopped. The first line is the date; each later line is a uid
+# that was appended to the output. A journal for another date is discarded.
+class CrawlCheckpoint:
+    def __init__(self, path, date):
+        self.path = path
+        self.date = date
+        self.done = set()
+        self.file = None
+
+    # Load the uids completed for this date and open the journal for appending
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as file:
+                lines = file.read().splitlines()
+            if lines and lines[0] == self.date:
+                self.done.update(line for line in lines[1:] if line)
+
+        if self.done:
+            self.file = open(self.path, 'a')
+        else:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.file = open(self.path, 'w')
+            self.file.write(f"{self.date}\n")
+            self.file.flush()
+        return self.done
+
+    # Record uids whose rows are safely in the output
+    def mark_done(self, *uids):
+        for uid in uids:
+            self.done.add(uid)
+            self.file.write(f"{uid}\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        if self.file is None:
+            self.load()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Function to read lines from the end of a file backwards
+def reverse_lines(path, block_size=1 << 16):
+    with open(path, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        remainder = b''
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            file.seek(position)
+            lines = (file.read(step) + remainder).split(b'\n')
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode('utf-8', errors='replace')
+        if remainder.strip():
+            yield remainder.decode('utf-8', errors='replace')
+
+# Function to collect the UserIDs already written for `date` at the end of an
+# append-only CSV. Rows are appended in date blocks, so only the trailing
+# block is read, however large the file is.
+def uids_written_for_date(csv_path, date, date_index=0, uid_index=3):
+    uids = set()
+    if not os.path.exists(csv_path):
+        return uids
+    for line in reverse_lines(csv_path):
+        # A run that starts under a new layout writes a header line first
+        if line.startswith('Date,'):
+            continue
+        row = next(csv.reader([line]), [])
+        if len(row) <= uid_index or row[date_index] != date:
+            break
+        uids.add(row[uid_index])
+    return uids
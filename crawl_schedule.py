@@ -0,0 +1,81 @@
+import os
+import struct
+
+from uid_registry import uid_key
+
+# Players whose activity moved within ACTIVE_DAYS are crawled every day, then
+# every WEEKLY_DAYS until DORMANT_DAYS without activity, then every MONTHLY_DAYS
+ACTIVE_DAYS = 7
+DORMANT_DAYS = 30
+WEEKLY_DAYS = 7
+MONTHLY_DAYS = 30
+
+# One record per crawled uid: the 12-byte ObjectId, the last `time` and
+# `ping_time` values seen, and the day ordinals of the last crawl and of the
+# last crawl where either value had moved
+RECORD = struct.Struct('<12sqqII')
+
+# Per-uid crawl history used to skip dormant players. A player is due when
+# it was never crawled, appears in today's player list, or its last crawl is
+# older than the interval for how long its `time`/`ping_time` have been still.
+# A player already crawled today stays due that day, so every crawl sharing
+# the schedule (another sink, the Supabase loader) plans the same players.
+class CrawlSchedule:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as file:
+                data = file.read()
+            usable = len(data) - len(data) % RECORD.size
+            for key, time, ping_time, crawled, active in RECORD.iter_unpack(data[:usable]):
+                self.entries[key] = [time, ping_time, crawled, active]
+        return self
+
+    # Number of days between crawls for a player idle for `idle` days
+    @staticmethod
+    def interval(idle):
+        if idle <= ACTIVE_DAYS:
+            return 1
+        if idle <= DORMANT_DAYS:
+            return WEEKLY_DAYS
+        return MONTHLY_DAYS
+
+    # Whether `uid` should be crawled on `day`; `seen` is the date it was last in the player list
+    def due(self, uid, day, seen=None):
+        entry = self.entries.get(uid_key(uid))
+        if entry is None or seen is not None and seen >= day:
+            return True
+        _, _, crawled, active = entry
+        today = day.toordinal()
+        return crawled == today or today - crawled >= self.interval(today - active)
+
+    # Record a crawl of `uid` on `day` with its stats response
+    def record(self, uid, day, player_info):
+        key = uid_key(uid)
+        today = day.toordinal()
+        time = int(player_info.get('time') or 0)
+        ping_time = int(player_info.get('ping_time') or 0)
+        entry = self.entries.get(key)
+        # Without either field there is nothing to decay on, so keep crawling daily
+        if entry is None or (time, ping_time) != tuple(entry[:2]) or not (time or ping_time):
+            self.entries[key] = [time, ping_time, today, today]
+        else:
+            entry[2] = today
+
+    # Split `uids` into those due on `day` and those skipped
+    def plan(self, uids, day, last_seen=None):
+        due, skipped = [], []
+        for uid in uids:
+            seen = last_seen(uid) if last_seen else None
+            (due if self.due(uid, day, seen) else skipped).append(uid)
+        return due, skipped
+
+    # Write every record, in sorted uid order, through a temporary file
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.tmp', 'wb') as file:
+            file.write(b''.join(RECORD.pack(key, *self.entries[key]) for key in sorted(self.entries)))
+        os.replace(self.path + '.tmp', self.path)
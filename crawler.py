@@ -0,0 +1,165 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+# Default number of requests in flight against the stats server
+DEFAULT_WORKERS = int(os.getenv('WBTSDB_WORKERS', '8'))
+
+# Default request rate limit in requests per second (0 disables the limit)
+DEFAULT_RATE = float(os.getenv('WBTSDB_RATE', '20'))
+
+# Attempts per uid within a pass, and passes over the retry queue at the end
+DEFAULT_MAX_ATTEMPTS = int(os.getenv('WBTSDB_MAX_ATTEMPTS', '3'))
+DEFAULT_RETRY_ROUNDS = int(os.getenv('WBTSDB_RETRY_ROUNDS', '2'))
+
+# Backoff base and cap in seconds
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+# Token bucket limiting how fast requests are started across all workers
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = max(1.0, float(burst or rate or 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Block until a token is available
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+# Concurrency limit that grows additively while the server answers quickly and
+# halves on throttling, server errors, timeouts or when latency climbs
+class AdaptiveConcurrency:
+    def __init__(self, max_limit, min_limit=1, target_latency=2.0):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.target_latency = target_latency
+        self.latency = None
+        self._limit = float(self.max_limit)
+        self.lock = threading.Lock()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def record_success(self, latency):
+        with self.lock:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if self.latency > 2 * self.target_latency:
+                self._limit = max(self.min_limit, self._limit * 0.9)
+            elif self.latency <= self.target_latency:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+    def record_failure(self):
+        with self.lock:
+            self._limit = max(self.min_limit, self._limit / 2)
+
+# Function to check whether an error is worth retrying (429, 5xx, timeouts, dropped connections)
+def is_retryable(error):
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status == 429 or (status is not None and status >= 500)
+    return isinstance(error, (requests.Timeout, requests.ConnectionError))
+
+# Function to compute the delay before the next attempt: exponential backoff
+# with full jitter, or the server's Retry-After when it sends one
+def backoff_delay(attempt, error=None):
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(BACKOFF_CAP, float(retry_after))
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+# Rate limiter, backoff and adaptive concurrency shared by one crawl
+class CrawlScheduler:
+    def __init__(self, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, retry_rounds=DEFAULT_RETRY_ROUNDS):
+        self.workers = max(1, int(workers))
+        self.bucket = TokenBucket(rate, burst=self.workers)
+        self.concurrency = AdaptiveConcurrency(self.workers)
+        self.max_attempts = max(1, int(max_attempts))
+        self.retry_rounds = max(0, int(retry_rounds))
+        self.retried = 0
+        self.lock = threading.Lock()
+
+    # Call fetch(uid) in a worker thread, backing off and retrying transient errors
+    def call(self, fetch, uid):
+        for attempt in range(self.max_attempts):
+            self.bucket.acquire()
+            start = time.monotonic()
+            try:
+                result = fetch(uid)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.concurrency.record_failure()
+                if attempt + 1 == self.max_attempts:
+                    raise
+                with self.lock:
+                    self.retried += 1
+                time.sleep(backoff_delay(attempt, e))
+                continue
+            self.concurrency.record_success(time.monotonic() - start)
+            return result
+
+# Run one pass over uids, keeping at most the scheduler's current limit in flight
+def _run_pass(uids, fetch, scheduler):
+    uids = iter(uids)
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=scheduler.workers) as executor:
+        def fill():
+            while len(pending) < max(1, scheduler.concurrency.limit):
+                uid = next(uids, None)
+                if uid is None:
+                    return
+                pending[executor.submit(scheduler.call, fetch, uid)] = uid
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                uid = pending.pop(future)
+                try:
+                    yield uid, future.result(), None
+                except Exception as e:
+                    yield uid, None, e
+            fill()
+
+# Fetch every uid with a bounded, rate-limited pool of workers and yield
+# (uid, result, error) as each request finishes, so a single consumer can write
+# the rows. Uids that still fail with a transient error are queued and
+# re-attempted at the end of the run before their error is reported.
+def fetch_concurrently(uids, fetch, workers=DEFAULT_WORKERS, scheduler=None):
+    scheduler = scheduler or CrawlScheduler(workers=workers)
+    queue = uids
+
+    for round_number in range(scheduler.retry_rounds + 1):
+        retry_queue = []
+        for uid, result, error in _run_pass(queue, fetch, scheduler):
+            if error is not None and is_retryable(error) and round_number < scheduler.retry_rounds:
+                retry_queue.append(uid)
+                continue
+            yield uid, result, error
+        if not retry_queue:
+            break
+        with scheduler.lock:
+            scheduler.retried += len(retry_queue)
+        queue = retry_queue
@@ -0,0 +1,228 @@
+import argparse
+import csv
+import mmap
+import os
+import struct
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from sinks import DATE_FORMAT
+from uid_registry import uid_key
+
+# Index file layout: a header holding a magic number and how many bytes of the
+# CSV are indexed, then one fixed-size record per row in file order
+HEADER = struct.Struct('<4sIQ')
+MAGIC = b'WBIX'
+VERSION = 1
+RECORD = np.dtype([('uid', 'S12'), ('date', '<u4'), ('offset', '<u8'), ('length', '<u4')])
+
+# Bytes read per step while indexing newly appended rows
+SCAN_BYTES = 1 << 22
+
+# Function to split off the first `count` fields of a CSV line (bytes) without parsing the rest of it
+def leading_fields(line, count):
+    fields, position = [], 0
+    while len(fields) < count:
+        if line.startswith(b'"', position):
+            end = position + 1
+            while True:
+                end = line.index(b'"', end)
+                if line.startswith(b'"', end + 1):
+                    end += 2
+                    continue
+                break
+            fields.append(line[position + 1:end].replace(b'""', b'"'))
+            position = end + 2
+        else:
+            end = line.find(b',', position)
+            if end < 0:
+                fields.append(line[position:].rstrip(b'\r\n'))
+                break
+            fields.append(line[position:end])
+            position = end + 1
+    return fields
+
+# Function to keep the first record (in file order) of each distinct value of `field`
+def first_rows(records, field):
+    return records[np.sort(np.unique(records[field], return_index=True)[1])]
+
+# Sidecar byte-offset index of the time-series CSV. Every complete row is
+# recorded as (UserID, Date, offset, length), so one player's history or one
+# day's snapshot is read by seeking straight to its bytes instead of scanning
+# the file. update() indexes whatever was appended since the last call, so it
+# can run after every flush of the writer or before a lookup.
+class CsvIndex:
+    def __init__(self, path, csv_path, date_index=0, uid_index=3):
+        self.path = path
+        self.csv_path = csv_path
+        self.date_index = date_index
+        self.uid_index = uid_index
+        self.covered = 0
+        self.records = np.zeros(0, dtype=RECORD)
+
+    def load(self):
+        self.covered, self.records = 0, np.zeros(0, dtype=RECORD)
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as file:
+                header = file.read(HEADER.size)
+                if len(header) == HEADER.size:
+                    magic, version, covered = HEADER.unpack(header)
+                    if magic == MAGIC and version == VERSION:
+                        self.covered = covered
+                        self.records = np.fromfile(file, dtype=RECORD, count=-1)
+        # Records past the header's mark were appended by an update that never finished
+        keep = np.searchsorted(self.records['offset'], self.covered)
+        self.records = self.records[:keep]
+        return self
+
+    # Whether the indexed part of the CSV still looks like the file on disk
+    def valid(self):
+        if not os.path.exists(self.csv_path):
+            return self.covered == 0
+        size = os.path.getsize(self.csv_path)
+        if self.covered > size:
+            return False
+        if self.covered:
+            with open(self.csv_path, 'rb') as file:
+                file.seek(self.covered - 1)
+                return file.read(1) == b'\n'
+        return True
+
+    # Index the complete rows appended to the CSV since the last update; returns how many were added
+    def update(self):
+        if not self.valid():
+            self.covered, self.records = 0, np.zeros(0, dtype=RECORD)
+            self.save(rewrite=True)
+        if not os.path.exists(self.csv_path):
+            return 0
+
+        added = []
+        fields = max(self.date_index, self.uid_index) + 1
+        dates = {}
+        with open(self.csv_path, 'rb') as file:
+            file.seek(self.covered)
+            position = self.covered
+            remainder = b''
+            while True:
+                chunk = file.read(SCAN_BYTES)
+                if not chunk:
+                    break
+                lines = (remainder + chunk).split(b'\n')
+                remainder = lines.pop()
+                for line in lines:
+                    length = len(line) + 1
+                    if line and not line.startswith(b'Date,'):
+                        try:
+                            values = leading_fields(line, fields)
+                            day = dates.get(values[self.date_index])
+                            if day is None:
+                                day = dates[values[self.date_index]] = datetime.strptime(
+                                    values[self.date_index].decode(), DATE_FORMAT).toordinal()
+                            added.append((uid_key(values[self.uid_index].decode()), day, position, length))
+                        except (ValueError, IndexError):
+                            # Rows without a parseable Date/UserID are left out of the index
+                            pass
+                    position += length
+        # A trailing partial line is indexed once it is complete
+        self.covered = position
+
+        if added:
+            new = np.array(added, dtype=RECORD)
+            self.records = np.concatenate([self.records, new])
+            self.save(new)
+        else:
+            self.save(np.zeros(0, dtype=RECORD))
+        return len(added)
+
+    # Append `new` records, then move the header's mark past them
+    def save(self, new=None, rewrite=False):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if rewrite or not os.path.exists(self.path):
+            with open(self.path, 'wb') as file:
+                file.write(HEADER.pack(MAGIC, VERSION, self.covered))
+                self.records.tofile(file)
+            return
+        with open(self.path, 'rb+') as file:
+            file.seek(HEADER.size + (len(self.records) - len(new)) * RECORD.itemsize)
+            new.tofile(file)
+            file.flush()
+            os.fsync(file.fileno())
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, VERSION, self.covered))
+
+    # Every crawl date in the index, oldest first
+    def dates(self):
+        return [datetime.fromordinal(int(day)).strftime(DATE_FORMAT) for day in np.unique(self.records['date'])]
+
+    # Byte ranges [(start, end)] holding the rows of `date`, one range unless
+    # the date was appended in several runs. A player's row appended again is
+    # left out, as the readers with `unique` do.
+    def date_blocks(self, date):
+        day = datetime.strptime(date, DATE_FORMAT).toordinal()
+        rows = first_rows(self.records[self.records['date'] == day], 'uid')
+        if not len(rows):
+            return []
+        starts = rows['offset']
+        ends = starts + rows['length']
+        # Rows are in file order; a gap between one row's end and the next start splits a block
+        breaks = np.nonzero(starts[1:] != ends[:-1])[0] + 1
+        return [(int(starts[first]), int(ends[last - 1]))
+                for first, last in zip(np.r_[0, breaks], np.r_[breaks, len(rows)])]
+
+    # Row locations [(date, offset, length)] of one player, oldest first, the first row of each date only
+    def player_offsets(self, uid, start=None, end=None):
+        rows = self.records[self.records['uid'] == uid_key(uid)]
+        if start is not None:
+            rows = rows[rows['date'] >= datetime.strptime(start, DATE_FORMAT).toordinal()]
+        if end is not None:
+            rows = rows[rows['date'] <= datetime.strptime(end, DATE_FORMAT).toordinal()]
+        rows = first_rows(rows, 'date')
+        rows = rows[np.argsort(rows['date'], kind='stable')]
+        return [(datetime.fromordinal(int(row['date'])).strftime(DATE_FORMAT), int(row['offset']), int(row['length']))
+                for row in rows]
+
+    # Read one player's rows, oldest first, as parsed CSV rows
+    def read_player(self, uid, start=None, end=None):
+        locations = self.player_offsets(uid, start, end)
+        if not locations:
+            return []
+        with open(self.csv_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            lines = [view[offset:offset + length].decode() for _, offset, length in locations]
+        return list(csv.reader(lines))
+
+    # Read every row of one crawl date as parsed CSV rows
+    def read_date(self, date):
+        rows = []
+        with open(self.csv_path, 'rb') as file:
+            for start, end in self.date_blocks(date):
+                file.seek(start)
+                block = file.read(end - start).decode()
+                rows.extend(row for row in csv.reader(block.splitlines()) if row and row[0] != 'Date')
+        return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the byte-offset index of the time-series CSV")
+    parser.add_argument('--csv', default='./data/wbuserdata_ts.csv')
+    parser.add_argument('--index', help="index file (default: <csv>.idx)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help="index rows appended since the last update")
+    player = commands.add_parser('player', help="print one player's rows")
+    player.add_argument('uid')
+    player.add_argument('--start', help="first date, MMDDYYYY")
+    player.add_argument('--end', help="last date, MMDDYYYY")
+    day = commands.add_parser('date', help="print the byte ranges and row count of one crawl date")
+    day.add_argument('date', help="MMDDYYYY")
+    args = parser.parse_args()
+
+    index = CsvIndex(args.index or args.csv + '.idx', args.csv).load()
+    added = index.update()
+    if args.command == 'build':
+        print(f"Indexed {added} new rows, {len(index.records)} rows over {len(index.dates())} dates")
+    elif args.command == 'player':
+        writer = csv.writer(sys.stdout)
+        writer.writerows(index.read_player(args.uid, args.start, args.end))
+    else:
+        blocks = index.date_blocks(args.date)
+        print(f"{len(index.read_date(args.date))} rows in {blocks}")
@@ -0,0 +1,192 @@
+import argparse
+import csv
+import os
+from datetime import datetime
+
+import numpy as np
+
+from sinks import DATE_FORMAT
+from stats_schema import StatsSchema, column_name, damage_names, weapon_keys
+from tsreader import csv_headers, read_csv_columns
+
+# Where the derived table is written by default
+derived_file_path = './data/wbuserdata_derived.csv'
+
+# Counter categories the derived metrics are computed from
+COUNTER_CATEGORIES = ['kills_per_weapon', 'deaths', 'headshots', 'shots_fired_unzoomed', 'shots_fired_zoomed',
+                      'shots_hit_unzoomed', 'shots_hit_zoomed']
+
+# Raw counters of many players over many crawl dates, one float array of
+# shape (players, dates, keys) per category. `keys` are the API keys along the
+# last axis: ('total',) for the category totals or weapon keys such as 'p61'.
+# A player not crawled on a date has NaN there. `cells` holds the
+# (player, date) position of each source row, to place other columns the same way.
+class CounterCube:
+    def __init__(self, players, dates, keys, counters, cells=None):
+        self.players = players
+        self.dates = dates
+        self.keys = keys
+        self.counters = counters
+        self.cells = cells
+
+    @property
+    def shape(self):
+        return len(self.players), len(self.dates), len(self.keys)
+
+    # Function to lay one column of the source rows out as a (players, dates)
+    # array, NaN (None for text) where the player was not crawled
+    def grid(self, values):
+        text = values.dtype == object
+        result = np.full(self.shape[:2], None if text else np.nan, dtype=object if text else np.float64)
+        result[self.cells] = values
+        return result
+
+# Names of the CSV columns holding the counters of `categories` for `keys`
+def counter_columns(categories=COUNTER_CATEGORIES, keys=('total',)):
+    return [column_name(category, key) for category in categories for key in keys]
+
+# Build a CounterCube from columns already read with tsreader.read_csv_columns
+def counter_cube(data, categories=COUNTER_CATEGORIES, keys=('total',)):
+    keys = tuple(keys)
+    players, player_index = np.unique(data['UserID'].astype(str), return_inverse=True)
+    date_strings, date_index = np.unique(data['Date'].astype(str), return_inverse=True)
+    # Order the dates by day rather than by their MMDDYYYY text
+    days = np.array([datetime.strptime(value, DATE_FORMAT).toordinal() for value in date_strings], dtype=np.int64)
+    order = np.argsort(days)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    dates = [datetime.fromordinal(int(day)).date() for day in days[order]]
+    date_index = rank[date_index]
+
+    counters = {}
+    for category in categories:
+        cube = np.full((len(players), len(dates), len(keys)), np.nan)
+        # Counters a response left out are stored empty, and columns that
+        # weren't read are missing; both are zero
+        columns = [data[name] if name in data else np.full(len(player_index), np.nan)
+                   for name in (column_name(category, key) for key in keys)]
+        cube[player_index, date_index] = np.nan_to_num(np.column_stack(columns))
+        counters[category] = cube
+    return CounterCube(list(players), dates, keys, counters, (player_index, date_index))
+
+# Load the counters of `categories` for `keys` from the time-series CSV into a
+# CounterCube. Only the needed columns are parsed (see tsreader.iter_csv_batches)
+# and a (Date, UserID) pair appended twice is counted once. Counters no header
+# of the file has a column for, e.g. weapons added after the file's only
+# layout, are left out and count as zero.
+def load_counters(path, categories=COUNTER_CATEGORIES, keys=('total',), uids=None, start=None, end=None):
+    # A file without a header is in the StatsSchema layout
+    known = set().union(*csv_headers(path)) or set(StatsSchema().columns)
+    columns = [column for column in counter_columns(categories, keys) if column in known]
+    data = read_csv_columns(path, ['Date', 'UserID'] + columns, uids=uids, start=start, end=end)
+    return counter_cube(data, categories, keys)
+
+# Function to divide element-wise, with NaN where the denominator is not positive
+def ratio(numerator, denominator):
+    result = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    np.divide(numerator, denominator, out=result, where=denominator > 0)
+    return result
+
+# Function to compute kills/deaths the way the game shows it: kills alone when there are no deaths
+def kd_ratio(kills, deaths):
+    return np.where(deaths > 0, ratio(kills, deaths), kills)
+
+# Function to carry each player's last crawled value forward over the dates it was not crawled
+def forward_fill(values):
+    filled = ~np.isnan(values)
+    positions = np.where(filled, np.arange(values.shape[1])[None, :, None], 0)
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    result = np.take_along_axis(values, positions, axis=1)
+    # Before the first crawl there is nothing to carry
+    result[~np.maximum.accumulate(filled, axis=1)] = np.nan
+    return result
+
+# Function to get the change of a counter since the player's previous crawl,
+# on the dates the player was crawled. A counter that went down (a reset) and
+# the first crawl have no delta.
+def deltas(values):
+    previous = np.full_like(values, np.nan)
+    previous[:, 1:] = forward_fill(values)[:, :-1]
+    change = values - previous
+    change[change < 0] = np.nan
+    return change
+
+# Compute the derived metrics for every player, date and key at once. Ratios
+# are over the lifetime counters; the Period_ ratios and _Delta columns cover
+# the span since the player's previous crawl.
+def derive(cube):
+    counters = cube.counters
+    kills, deaths, headshots = counters['kills_per_weapon'], counters['deaths'], counters['headshots']
+    fired_unzoomed, fired_zoomed = counters['shots_fired_unzoomed'], counters['shots_fired_zoomed']
+    hit_unzoomed, hit_zoomed = counters['shots_hit_unzoomed'], counters['shots_hit_zoomed']
+    fired, hit = fired_unzoomed + fired_zoomed, hit_unzoomed + hit_zoomed
+
+    kills_delta, deaths_delta = deltas(kills), deltas(deaths)
+    fired_delta, hit_delta = deltas(fired), deltas(hit)
+    return {
+        'Kills': kills,
+        'Deaths': deaths,
+        'KD': kd_ratio(kills, deaths),
+        'Accuracy': ratio(hit, fired),
+        'Accuracy_Unzoomed': ratio(hit_unzoomed, fired_unzoomed),
+        'Accuracy_Zoomed': ratio(hit_zoomed, fired_zoomed),
+        'Headshot_Rate': ratio(headshots, kills),
+        'Kills_Delta': kills_delta,
+        'Deaths_Delta': deaths_delta,
+        'Shots_Fired_Delta': fired_delta,
+        'Shots_Hit_Delta': hit_delta,
+        'Period_KD': kd_ratio(kills_delta, deaths_delta),
+        'Period_Accuracy': ratio(hit_delta, fired_delta),
+    }
+
+# Metrics written as whole numbers; the rest are ratios
+COUNT_METRICS = {'Kills', 'Deaths', 'Kills_Delta', 'Deaths_Delta', 'Shots_Fired_Delta', 'Shots_Hit_Delta'}
+
+# Function to format one metric array as CSV cells, empty for NaN
+def format_cells(name, values):
+    cells = np.char.mod('%.0f' if name in COUNT_METRICS else '%.6g', values)
+    cells[np.isnan(values)] = ''
+    return cells
+
+# Write the derived metrics as a long table: one row per player and crawl date
+# (and weapon when the cube holds weapon keys), leaving out the dates a player
+# was not crawled and weapons it never used. The table is written through a
+# temporary file.
+def write_derived(path, cube, metrics):
+    crawled = ~np.isnan(cube.counters['kills_per_weapon'])
+    if cube.keys != ('total',):
+        crawled &= np.any([values > 0 for values in cube.counters.values()], axis=0)
+    player, day, key = np.nonzero(crawled)
+    players = np.array(cube.players, dtype=object)
+    dates = np.array([value.strftime(DATE_FORMAT) for value in cube.dates], dtype=object)
+
+    header, columns = ['Date', 'UserID'], [dates[day], players[player]]
+    if cube.keys != ('total',):
+        header.append('Weapon')
+        columns.append(np.array([damage_names.get(value, value) for value in cube.keys], dtype=object)[key])
+    for name, values in metrics.items():
+        header.append(name)
+        columns.append(format_cells(name, values[crawled]))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(zip(*columns))
+    os.replace(path + '.tmp', path)
+    return len(player)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute K/D, accuracy, headshot rate and per-crawl deltas "
+                                                 "for every player from the time-series CSV")
+    parser.add_argument('--csv', default='./data/wbuserdata_ts.csv')
+    parser.add_argument('--out', default=derived_file_path)
+    parser.add_argument('--start', help="first date, MMDDYYYY")
+    parser.add_argument('--end', help="last date, MMDDYYYY")
+    parser.add_argument('--per-weapon', action='store_true', help="one row per weapon instead of the totals")
+    args = parser.parse_args()
+
+    cube = load_counters(args.csv, keys=weapon_keys if args.per_weapon else ('total',), start=args.start, end=args.end)
+    rows = write_derived(args.out, cube, derive(cube))
+    players, dates, _ = cube.shape
+    print(f"Wrote {rows} rows for {players} players over {dates} dates to {args.out}")
@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# On-disk cache of HTTP validators and derived values, keyed by URL. Each
+# entry holds the response's ETag / Last-Modified, a hash of the body and the
+# value extracted from it, so an unchanged page never has to be parsed again.
+# Entries are kept in least-recently-used order and the oldest are evicted
+# once there are more than `max_entries`.
+class HttpCache:
+    def __init__(self, path, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as file:
+                    self.entries = OrderedDict(json.load(file))
+            except (OSError, ValueError):
+                # A corrupt cache is only a performance loss; start empty
+                self.entries = OrderedDict()
+        return self
+
+    def get(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+            return entry
+
+    def put(self, url, entry):
+        with self.lock:
+            self.entries[url] = entry
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    # Count a lookup that was answered from the cache (or not)
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self.lock:
+            with open(self.path + '.tmp', 'w') as file:
+                json.dump(list(self.entries.items()), file, separators=(',', ':'))
+        os.replace(self.path + '.tmp', self.path)
+
+    def __enter__(self):
+        return self.load()
+
+    def __exit__(self, *exc):
+        self.save()
+
+# Function to build conditional request headers from a cached entry
+def conditional_headers(entry):
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Cumulative-bucket histogram in the Prometheus style
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Estimate quantile `q` (0-1) by linear interpolation inside its bucket
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def to_dict(self):
+        cumulative, total = {}, 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            cumulative[str(bound)] = total
+        result = {'count': self.count, 'sum': round(self.sum, 6), 'buckets': cumulative}
+        for q in (0.5, 0.95, 0.99):
+            value = self.quantile(q)
+            result[f'p{round(q * 100)}'] = None if value is None else round(value, 6)
+        return result
+
+# Timers, counters and histograms for one crawl, safe to update from the
+# fetch worker threads. Stage timers add up the seconds spent in each stage
+# (network wait, JSON decode, flatten, write) across all threads.
+class RunMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.stages = Counter()
+        self.stage_calls = Counter()
+        self.counters = Counter()
+        self.errors = Counter()
+        self.histograms = {}
+        self.info = {}
+
+    def add_time(self, stage, seconds):
+        with self.lock:
+            self.stages[stage] += seconds
+            self.stage_calls[stage] += 1
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    # Count a failed player by the type of error it failed with
+    def error(self, error):
+        with self.lock:
+            self.counters['failed'] += 1
+            self.errors[type(error).__name__] += 1
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def report(self):
+        with self.lock:
+            return {
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'wall_seconds': round(time.perf_counter() - self.start, 3),
+                **self.info,
+                'stages': {stage: {'seconds': round(seconds, 3), 'calls': self.stage_calls[stage]}
+                           for stage, seconds in self.stages.items()},
+                'counters': dict(self.counters),
+                'errors': dict(self.errors),
+                'histograms': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+
+    # Write the run report as JSON
+    def write_report(self, path):
+        report = self.report()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=2)
+        return report
+
+    # Write the metrics in the Prometheus text format, e.g. for node_exporter's textfile collector
+    def write_prometheus(self, path, prefix='wbtsdb'):
+        report = self.report()
+        lines = [f'# TYPE {prefix}_run_wall_seconds gauge', f'{prefix}_run_wall_seconds {report["wall_seconds"]}',
+                 f'# TYPE {prefix}_run_started_timestamp_seconds gauge',
+                 f'{prefix}_run_started_timestamp_seconds {self.started:.0f}',
+                 f'# TYPE {prefix}_stage_seconds gauge']
+        lines += [f'{prefix}_stage_seconds{{stage="{stage}"}} {stage_report["seconds"]}'
+                  for stage, stage_report in report['stages'].items()]
+        for name, value in report['counters'].items():
+            lines += [f'# TYPE {prefix}_{name}_total counter', f'{prefix}_{name}_total {value}']
+        if report['errors']:
+            lines.append(f'# TYPE {prefix}_errors_total counter')
+            lines += [f'{prefix}_errors_total{{type="{error}"}} {value}' for error, value in report['errors'].items()]
+        for name, histogram in report['histograms'].items():
+            lines.append(f'# TYPE {prefix}_{name} histogram')
+            lines += [f'{prefix}_{name}_bucket{{le="{bound}"}} {count}' for bound, count in histogram['buckets'].items()]
+            lines += [f'{prefix}_{name}_sum {histogram["sum"]}', f'{prefix}_{name}_count {histogram["count"]}']
+
+        # Written through a temporary file so a scraper never reads half a file
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.tmp', 'w') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,270 @@
+import argparse
+import glob
+import heapq
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from sinks import DATE_FORMAT, DEFAULT_FLUSH_ROWS, partition_name, _to_number
+from stats_schema import column_name
+from tsreader import iter_csv_batches
+
+# Where the leaderboards are written, one JSON file per crawl date
+leaderboard_dir_path = './data/leaderboards/'
+
+# Metrics ranked by default and how many players each board keeps
+DEFAULT_METRICS = ['KillsELO', 'GamesELO', 'XP', column_name('kills_per_weapon', 'total')]
+DEFAULT_SIZE = int(os.getenv('WBTSDB_LEADERBOARD_SIZE', '100'))
+
+# Function to get the leaderboard file of one crawl date, e.g. date=2026-10-18.json
+def leaderboard_path(directory, date):
+    return os.path.join(directory, partition_name(date) + '.json')
+
+# Function to load the latest boards saved for a date before `date`, or None
+def previous_leaderboards(directory, date):
+    day = datetime.strptime(date, DATE_FORMAT).strftime('%Y-%m-%d')
+    earlier = [path for path in glob.glob(os.path.join(directory, 'date=*.json'))
+               if os.path.basename(path)[len('date='):-len('.json')] < day]
+    if not earlier:
+        return None
+    with open(max(earlier), 'r') as file:
+        return json.load(file)
+
+# Function to get the file listing the uids pushed into a date's boards, next to the boards
+def pushed_path(path):
+    return path[:-len('.json')] + '.uids'
+
+# Top `size` players of one metric, kept in a min-heap of (value, uid) so each
+# new value costs O(log size) and most are rejected against the smallest kept
+# one in O(1). The board is exact when each uid is pushed once. A uid pushed
+# again with a higher value is moved up in place. A lower value (ELOs can go
+# down) can't be handled that way once the board is full, because players
+# evicted earlier may now rank above it and are gone, so the board is marked
+# stale and has to be rebuilt from the rows (see backfill).
+class Leaderboard:
+    def __init__(self, size=DEFAULT_SIZE):
+        self.size = size
+        self.heap = []
+        self.names = {}
+        self.values = {}
+        self.stale = False
+
+    # Smallest value a new player has to beat, None while the board is not full
+    @property
+    def threshold(self):
+        return self.heap[0][0] if len(self.heap) >= self.size else None
+
+    def push(self, value, uid, name=None):
+        if uid in self.values:
+            if value < self.values[uid] and len(self.heap) >= self.size:
+                self.stale = True
+            self.heap = [entry for entry in self.heap if entry[1] != uid]
+            heapq.heapify(self.heap)
+            del self.names[uid], self.values[uid]
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, (value, uid))
+        elif (value, uid) > self.heap[0]:
+            _, dropped = heapq.heapreplace(self.heap, (value, uid))
+            del self.names[dropped], self.values[dropped]
+        else:
+            return
+        self.names[uid] = name
+        self.values[uid] = value
+
+    # Entries as [(uid, name, value)], best first
+    def top(self):
+        return [(uid, self.names[uid], value) for value, uid in sorted(self.heap, reverse=True)]
+
+# Function to turn board entries into JSON lists, with whole numbers as ints
+def json_entries(entries):
+    return [[uid, name, int(value) if float(value).is_integer() else value] for uid, name, value in entries]
+
+# Function to get the top `size` of today's `entries` and the `previous`
+# board's entries of the players not `crawled` today, best first
+def carry_forward(entries, previous, crawled, size):
+    kept = [tuple(entry) for entry in previous if entry[0] not in crawled]
+    return sorted(list(entries) + kept, key=lambda entry: (entry[2], entry[0]), reverse=True)[:size]
+
+# Function to write the boards of one date as {"date", "size", "players",
+# "metrics": {metric: [[uid, name, value], ...]}, "stale": [metric, ...]}, where
+# `players` counts the uids pushed into them. Players crawled only weekly or
+# monthly keep their place: with the `previous` date's saved boards, the
+# entries of players not `crawled` today are carried into "metrics", and the
+# boards of today's crawl alone are kept under "crawled". Returns the saved data.
+def write_leaderboards(path, date, boards, size, players=None, previous=None, crawled=()):
+    data = {'date': date, 'size': size, 'players': players,
+            'metrics': {metric: json_entries(board.top()) for metric, board in boards.items()},
+            'stale': [metric for metric, board in boards.items() if board.stale]}
+    if previous is not None:
+        data['crawled'] = data['metrics']
+        data['metrics'] = {metric: json_entries(carry_forward(board.top(), previous['metrics'].get(metric, []),
+                                                              crawled, size))
+                           for metric, board in boards.items()}
+        # Carried entries are only as good as the board they came from
+        data['stale'] = [metric for metric in boards if metric in data['stale'] or
+                         metric in previous.get('stale', [])]
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(data, file, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+    return data
+
+# Top `limit` players of `metric` on `date` as [(UserID, Name, value)], read
+# from the materialized board. A stale board is refused rather than served.
+def read_leaderboard(date, metric, limit=None, directory=leaderboard_dir_path):
+    with open(leaderboard_path(directory, date), 'r') as file:
+        saved = json.load(file)
+    boards = saved['metrics']
+    if metric not in boards:
+        raise KeyError(f"No leaderboard for {metric!r} on {date}, only {', '.join(boards)}")
+    if metric in saved.get('stale', []):
+        raise ValueError(f"The {metric} leaderboard for {date} is stale; rebuild it with 'leaderboards.py backfill'")
+    return [tuple(entry) for entry in boards[metric][:limit]]
+
+# Sink that keeps the day's top-K boards as the rows stream through the
+# crawl, written next to the other stores every `flush_rows` rows, with the
+# players not crawled today carried over from the latest earlier boards (see
+# write_leaderboards). Each flush first appends the flushed uids to a .uids
+# file, then writes the boards with the number of uids they include. On
+# open, the boards of an interrupted run are loaded back, and uids listed
+# past that number are dropped. written_uids() then reports exactly the
+# players already on the boards, so a resumed crawl pushes every other
+# player once and none twice.
+class LeaderboardSink:
+    def __init__(self, directory, schema, date, metrics=DEFAULT_METRICS, size=DEFAULT_SIZE,
+                 flush_rows=DEFAULT_FLUSH_ROWS, on_flush=None):
+        self.directory = directory
+        self.path = leaderboard_path(directory, date)
+        self.pushed_path = pushed_path(self.path)
+        self.date = date
+        self.size = size
+        self.flush_rows = flush_rows
+        self.on_flush = on_flush
+        self.uid_index = schema.uid_index
+        self.name_index = schema.columns.index('Name')
+        self.metrics = [(metric, schema.columns.index(metric)) for metric in metrics]
+        self.boards = {metric: Leaderboard(size) for metric in metrics}
+        self.previous = None
+        self.crawled = set()
+        self.pushed = []
+        self.keys = []
+
+    def open(self):
+        self.previous = previous_leaderboards(self.directory, self.date)
+        saved = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as file:
+                saved = json.load(file)
+            # Only today's own entries go back on the boards, not the carried ones
+            crawled = saved.get('crawled', saved['metrics'])
+            for metric, board in self.boards.items():
+                for uid, name, value in crawled.get(metric, []):
+                    board.push(value, uid, name)
+                board.stale = metric in saved.get('stale', [])
+        if os.path.exists(self.pushed_path):
+            with open(self.pushed_path, 'r') as file:
+                self.pushed = file.read().split()
+        # Uids appended by a flush that never got to write the boards aren't on them
+        count = saved.get('players')
+        if count is not None and len(self.pushed) > count:
+            self.pushed = self.pushed[:count]
+            with open(self.pushed_path + '.tmp', 'w') as file:
+                file.write(''.join(f'{uid}\n' for uid in self.pushed))
+            os.replace(self.pushed_path + '.tmp', self.pushed_path)
+        self.crawled = set(self.pushed)
+        return self
+
+    def write(self, row, key=None):
+        uid, name = row[self.uid_index], row[self.name_index]
+        self.crawled.add(uid)
+        for metric, index in self.metrics:
+            value = _to_number(row[index])
+            if value is not None:
+                self.boards[metric].push(value, uid, name)
+        if key is not None:
+            self.keys.append(key)
+        if len(self.keys) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        keys, self.keys = self.keys, []
+        if keys:
+            os.makedirs(os.path.dirname(self.pushed_path) or '.', exist_ok=True)
+            with open(self.pushed_path, 'a') as file:
+                file.write(''.join(f'{uid}\n' for uid in keys))
+                file.flush()
+                os.fsync(file.fileno())
+            self.pushed.extend(keys)
+            write_leaderboards(self.path, self.date, self.boards, self.size, len(self.pushed),
+                               self.previous, self.crawled)
+            if self.on_flush:
+                self.on_flush(keys)
+
+    def commit(self):
+        self.flush()
+
+    def close(self):
+        self.commit()
+
+    # Uids already pushed into the boards of `date`
+    def written_uids(self, date):
+        return set(self.pushed) if date == self.date else set()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Rebuild the boards of every date in the time-series CSV in one pass, e.g.
+# for the dates crawled before the pipeline kept them. Each batch only pushes
+# the values that beat the board's current threshold. The dates are then
+# written oldest first, each carrying the players it didn't crawl over from
+# the date before, as the sink does.
+def backfill(csv_path, directory=leaderboard_dir_path, metrics=DEFAULT_METRICS, size=DEFAULT_SIZE):
+    boards, crawled = {}, {}
+    for batch in iter_csv_batches(csv_path, ['Date', 'UserID', 'Name'] + list(metrics), unique=True):
+        for date in np.unique(batch['Date']):
+            rows = batch['Date'] == date
+            uids, names = batch['UserID'][rows], batch['Name'][rows]
+            crawled.setdefault(date, set()).update(uids)
+            day = boards.setdefault(date, {metric: Leaderboard(size) for metric in metrics})
+            for metric in metrics:
+                values, board = batch[metric][rows], day[metric]
+                candidates = ~np.isnan(values)
+                if board.threshold is not None:
+                    candidates &= values >= board.threshold
+                for index in np.nonzero(candidates)[0]:
+                    board.push(float(values[index]), uids[index], names[index])
+    dates = sorted(boards, key=lambda date: datetime.strptime(date, DATE_FORMAT))
+    previous = None
+    for date in dates:
+        previous = write_leaderboards(leaderboard_path(directory, date), date, boards[date], size,
+                                      previous=previous, crawled=crawled[date])
+    return dates
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read or rebuild the per-date top-K leaderboards")
+    parser.add_argument('--dir', default=leaderboard_dir_path, help="directory of the leaderboard files")
+    commands = parser.add_subparsers(dest='command', required=True)
+    top = commands.add_parser('top', help="leaderboard of a metric on one crawl date")
+    top.add_argument('date', help="crawl date, e.g. 10182026")
+    top.add_argument('metric', help=f"one of {', '.join(DEFAULT_METRICS)}")
+    top.add_argument('--limit', type=int, default=10)
+    rebuild = commands.add_parser('backfill', help="rebuild the boards of every date from the time-series CSV")
+    rebuild.add_argument('--csv', default='./data/wbuserdata_ts.csv')
+    rebuild.add_argument('--size', type=int, default=DEFAULT_SIZE)
+    args = parser.parse_args()
+
+    if args.command == 'backfill':
+        dates = backfill(args.csv, args.dir, size=args.size)
+        print(f"Wrote leaderboards for {len(dates)} dates to {args.dir}")
+    else:
+        try:
+            rows = read_leaderboard(args.date, args.metric, args.limit, args.dir)
+        except (KeyError, ValueError, OSError) as e:
+            parser.error(str(e))
+        for row in rows:
+            print(*row, sep='\t')
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from stats_schema import categories
+
+# Default location of recorded fixtures: {"player_list": [...], "players": {uid: stats}}
+fixtures_file_path = './fixtures/ratsstats.json'
+
+# Function to load recorded fixtures
+def load_fixtures(path=fixtures_file_path):
+    with open(path, 'r') as file:
+        return json.load(file)
+
+# Function to record fixtures from the real server: the current player list
+# plus the stats of up to `limit` players (all of them when None)
+def record_fixtures(path=fixtures_file_path, limit=None):
+    from ratsstats import get_player_list, get_player_info
+    player_list = get_player_list()
+    uids = [player['uid'] for player in player_list][:limit]
+    fixtures = {'player_list': player_list, 'players': {uid: get_player_info(uid) for uid in uids}}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(fixtures, file)
+    return fixtures
+
+# Function to make `count` synthetic players shaped like real responses, for
+# load tests that need more players than a recording holds. The same seed
+# always gives the same players.
+def synthetic_fixtures(count, listed=100, seed=0):
+    generator = random.Random(seed)
+    players = {}
+    for number in range(count):
+        uid = '%024x' % (0x5b0000000000000000000000 + number)
+        player = {
+            'uid': uid, 'nick': f'player{number}', 'squad': f'squad{number % 50}',
+            'level': generator.randint(1, 100), 'xp': generator.randint(0, 10 ** 7),
+            'joinTime': 1500000000 + number, 'ping_time': 1700000000 + generator.randint(0, 10 ** 7),
+            'time': 1700000000 + generator.randint(0, 10 ** 7), 'coins': generator.randint(0, 10 ** 5),
+            'killsELO': generator.uniform(800, 2000), 'gamesELO': generator.uniform(800, 2000),
+        }
+        for category, keys in categories:
+            player[category] = {key: generator.randint(0, 10 ** 4) for key in generator.sample(keys, min(8, len(keys)))}
+        players[uid] = player
+    player_list = [{'uid': uid, 'nick': players[uid]['nick'], 'squad': players[uid]['squad']}
+                   for uid in list(players)[:listed]]
+    return {'player_list': player_list, 'players': players}
+
+# Local stand-in for the ratsstats API serving fixtures, for benchmarks and
+# regression runs that must not touch the real server. Every request waits
+# `latency` seconds (plus up to `jitter`), then fails with a 503 with
+# probability `error_rate` or a 429 with Retry-After with probability
+# `throttle_rate`. Besides get_player_stats.php?uid=<uid> it answers bulk
+# requests with ?uids=<uid>,<uid>,... so the bulk fetch strategy can be tested.
+class MockRatsServer:
+    def __init__(self, fixtures, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, throttle_rate=0.0, seed=None):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    # Pick the injected failure for one request: None, 503 or 429
+    def failure(self):
+        with self.lock:
+            self.requests += 1
+            roll = self.random.random()
+            if roll < self.error_rate:
+                self.errors += 1
+                return 503
+            if roll < self.error_rate + self.throttle_rate:
+                self.throttled += 1
+                return 429
+        return None
+
+    def respond(self, path, query):
+        if path.endswith('get_player_list.php'):
+            return self.fixtures['player_list']
+        players = self.fixtures['players']
+        if 'uids' in query:
+            uids = query['uids'][0].split(',')
+            return {uid: players[uid] for uid in uids if uid in players}
+        if 'uid' in query:
+            # PHP answers an unknown uid with an empty list
+            return players.get(query['uid'][0], [])
+        return None
+
+    def handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Send headers and body in one packet so keep-alive clients don't wait on delayed ACKs
+            disable_nagle_algorithm = True
+            wbufsize = 1 << 16
+
+            def log_message(self, *args):
+                pass
+
+            def send(self, status, body=b'', headers=()):
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if mock.latency or mock.jitter:
+                    time.sleep(mock.latency + mock.random.uniform(0, mock.jitter))
+                status = mock.failure()
+                if status == 429:
+                    return self.send(429, headers=[('Retry-After', '1')])
+                if status is not None:
+                    return self.send(status)
+
+                url = urlparse(self.path)
+                data = mock.respond(url.path, parse_qs(url.query))
+                if data is None:
+                    return self.send(404)
+                self.send(200, json.dumps(data).encode(), [('Content-Type', 'application/json')])
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded ratsstats responses locally "
+                                                 "(point the crawlers at it with RATS_BASE_URL)")
+    parser.add_argument('--fixtures', default=fixtures_file_path, help="recorded fixtures to serve")
+    parser.add_argument('--record', action='store_true',
+                        help="record fixtures from the real server (needs RATS_USER/RATS_PASS) and exit")
+    parser.add_argument('--limit', type=int, help="with --record, the most players to record")
+    parser.add_argument('--synthetic', type=int, metavar='N', help="serve N generated players instead of fixtures")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to this many extra seconds at random")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with a 503")
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help="fraction of requests answered with a 429 and Retry-After")
+    parser.add_argument('--seed', type=int, help="seed for latency jitter and injected errors")
+    args = parser.parse_args()
+
+    if args.record:
+        fixtures = record_fixtures(args.fixtures, args.limit)
+        print(f"Recorded {len(fixtures['players'])} players to {args.fixtures}")
+    else:
+        fixtures = synthetic_fixtures(args.synthetic) if args.synthetic else load_fixtures(args.fixtures)
+        server = MockRatsServer(fixtures, port=args.port, latency=args.latency, jitter=args.jitter,
+                                error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=args.seed)
+        print(f"Serving {len(fixtures['players'])} players on {server.url}")
+        try:
+            server.server.serve_forever()
+        except KeyboardInterrupt:
+            server.server.server_close()
@@ -0,0 +1,190 @@
+import os
+from datetime import datetime
+from tqdm import tqdm
+from ratsstats import get_player_list, get_session, close_session, make_fetcher, instrument
+from crawler import fetch_concurrently, CrawlScheduler, DEFAULT_WORKERS, DEFAULT_RATE
+from checkpoint import CrawlCheckpoint
+from sinks import CsvSink, ParquetSink, DeltaSink, UpsertSink, SupabaseTable, FanOutSink, DEFAULT_BATCH_SIZE, DATE_FORMAT
+from sqlite_store import SqliteStore
+from stats_schema import StatsSchema
+from uid_registry import UidRegistry
+from crawl_schedule import CrawlSchedule
+from instrumentation import RunMetrics
+
+# Directory and file paths
+data_dir = './data/'
+csv_file_path = './data/wbuserdata_ts.csv'
+csv_index_file_path = './data/wbuserdata_ts.csv.idx'
+uids_file_path = './data/uniqueuids.txt'
+registry_file_path = './data/uids.bin'
+schedule_file_path = './data/crawl_schedule.bin'
+parquet_dir_path = './data/wbuserdata_ts/'
+delta_file_path = './data/wbuserdata_ts_delta.jsonl'
+delta_state_file_path = './data/wbuserdata_ts_delta_state.json.gz'
+sqlite_file_path = './data/wbuserdata_ts.db'
+leaderboard_dir_path = './data/leaderboards/'
+checkpoint_file_path = './data/wbtsdb_v2_{}.checkpoint'
+schema_report_file_path = './data/wbtsdb_v2_unknown_keys.json'
+run_report_file_path = './data/wbtsdb_v2_run_report.json'
+
+# Optional Prometheus text-format file for the run's metrics
+prometheus_file_path = os.getenv('WBTSDB_PROMETHEUS_FILE')
+
+# Supabase configuration
+supabase_url = os.getenv('SUPABASE_URL')
+supabase_key = os.getenv('SUPABASE_KEY')
+supabase_table = 'wbtsdb'
+
+# Storage backends a crawl can write to
+SINK_NAMES = ['csv', 'parquet', 'delta', 'sqlite', 'leaderboard', 'supabase']
+
+# Get the current date
+today = datetime.today().strftime('%m%d%Y')
+
+# Ensure the directory exists
+os.makedirs(data_dir, exist_ok=True)
+
+# Collect unique user IDs: the registry of every uid seen, updated with today's
+# player list. New uids are appended to the registry and the others only have
+# their last-seen date updated in place.
+def collect_unique_uids(date=today):
+    registry = UidRegistry(registry_file_path).load()
+
+    # Seed the registry from the old text list the first time
+    if not len(registry) and os.path.exists(uids_file_path):
+        registry.import_text(uids_file_path)
+
+    # Collect new UIDs from player list
+    day = datetime.strptime(date, DATE_FORMAT).date()
+    for player in get_player_list():
+        registry.add(player['uid'], day)
+
+    registry.save()
+    return registry
+
+# Function to create the sink for one storage backend
+def make_sink(name, schema, date=today, batch_size=DEFAULT_BATCH_SIZE):
+    if name == 'csv':
+        # The index needs numpy, which only the v2 workflow installs
+        from csv_index import CsvIndex
+        index = CsvIndex(csv_index_file_path, csv_file_path,
+                         schema.columns.index('Date'), schema.columns.index('UserID'))
+        return CsvSink(csv_file_path, header=schema.columns, index=index)
+    if name == 'parquet':
+        return ParquetSink(parquet_dir_path, schema.columns, date)
+    if name == 'delta':
+        return DeltaSink(delta_file_path, delta_state_file_path, schema.columns, schema.empty_row, date)
+    if name == 'sqlite':
+        return SqliteStore(sqlite_file_path, schema, date)
+    if name == 'leaderboard':
+        from leaderboards import LeaderboardSink
+        return LeaderboardSink(leaderboard_dir_path, schema, date)
+    if name == 'supabase':
+        from supabase import create_client
+        table = SupabaseTable(create_client(supabase_url, supabase_key), supabase_table)
+        return UpsertSink(table, batch_size=batch_size, columns=schema.legacy_columns)
+    raise ValueError(f"Unknown sink {name!r}, expected one of {', '.join(SINK_NAMES)}")
+
+# Crawl the known players that are due and write each row to all `sinks` in
+# the same pass. Dormant players are only crawled weekly or monthly unless
+# `full_sweep` is set. The crawl is journalled per date under `journal`, so an
+# interrupted run resumes with the players that are not yet in every sink.
+# Stage timings, counters and request latencies go to a JSON run report and,
+# with `prometheus_path`, to a Prometheus text file.
+def crawl(sinks, journal, schema=None, date=today, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, full_sweep=False,
+          fetcher=None, metrics=None, prometheus_path=prometheus_file_path):
+    schema = schema or StatsSchema()
+    fetcher = fetcher or make_fetcher()
+    day = datetime.strptime(date, DATE_FORMAT).date()
+    metrics = metrics or RunMetrics()
+    metrics.info.update(date=date, sinks=journal, fetch=type(fetcher).__name__, workers=workers, rate=rate,
+                        full_sweep=full_sweep)
+    instrument(metrics)
+
+    # Size the shared connection pool so every worker keeps its connection alive
+    get_session(pool_size=workers)
+    scheduler = CrawlScheduler(workers=workers, rate=rate)
+    registry = collect_unique_uids(date)
+
+    # Only crawl players whose activity makes them due today
+    schedule = CrawlSchedule(schedule_file_path).load()
+    if full_sweep:
+        unique_uids = registry.uids()
+    else:
+        unique_uids, skipped = schedule.plan(registry.uids(), day, registry.last_seen)
+        metrics.count('skipped_dormant', len(skipped))
+        if skipped:
+            print(f"Skipping {len(skipped)} dormant players not due today")
+
+    # Skip players already written for today by an earlier, interrupted run
+    checkpoint = CrawlCheckpoint(checkpoint_file_path.format(journal), date)
+    done = checkpoint.load()
+
+    # Rows are journalled as done once every sink has written them out;
+    # opening the sinks also drops anything half-written by a crash
+    sink = FanOutSink(sinks, on_flush=lambda uids: checkpoint.mark_done(*uids)).open()
+
+    # Rows that were written after the last journal entry still count as done
+    written = sink.written_uids(date) - done
+    if written:
+        checkpoint.mark_done(*written)
+    metrics.count('skipped_written', len(done))
+    if done:
+        print(f"Resuming {date}: skipping {len(done)} players already written")
+
+    # Only fetch players not yet written for today
+    remaining_uids = [uid for uid in unique_uids if uid not in done]
+
+    # Calculate total number of players for the progress bar
+    total_players = len(remaining_uids)
+
+    # Hand the fetcher as many uids per call as its strategy takes
+    size = fetcher.batch_size
+    batches = [tuple(remaining_uids[i:i + size]) for i in range(0, total_players, size)]
+
+    # Fetch players concurrently; rows are written here by a single writer
+    with checkpoint, sink, tqdm(total=total_players, desc="Processing Players", unit="player") as progress_bar:
+        for batch, players, batch_error in fetch_concurrently(batches, fetcher.fetch, scheduler=scheduler):
+            for uid in batch:
+                try:
+                    if batch_error is not None:
+                        raise batch_error
+                    player_info = players.get(uid)
+
+                    # Skip if player_info is None
+                    if player_info:
+                        with metrics.timer('flatten'):
+                            row = schema.project(date, uid, player_info)
+                        with metrics.timer('write'):
+                            sink.write(row, key=uid)
+                        metrics.count('succeeded')
+                    else:
+                        checkpoint.mark_done(uid)
+                        metrics.count('empty')
+                    schedule.record(uid, day, player_info or {})
+
+                except Exception as e:
+                    metrics.error(e)
+                    print(f"Error processing user {uid}: {e}")
+
+            # Update the progress bar
+            progress_bar.update(len(batch))
+
+    close_session()
+    instrument(None)
+    schedule.save()
+    metrics.count('retried', scheduler.retried)
+    metrics.info['concurrency_limit'] = scheduler.concurrency.limit
+
+    # Report API keys the schema has no column for yet
+    if schema.unknown:
+        schema.write_unknown_report(schema_report_file_path)
+        print(f"{len(schema.unknown)} unknown stat keys, see {schema_report_file_path}")
+
+    # Write the run report, and the Prometheus file when asked for
+    metrics.write_report(run_report_file_path)
+    if prometheus_path:
+        metrics.write_prometheus(prometheus_path)
+    failed = metrics.counters['failed']
+    print(f"Done: {total_players - failed} players processed, {failed} failed, {scheduler.retried} retries")
+    return sink
@@ -0,0 +1,91 @@
+import csv
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from sinks import CsvSink
+
+# Long-format store: one (date, squad, players) row per squad per run
+long_file_path = './data/playerdb_long.csv'
+long_header = ['date', 'squad', 'players']
+
+# Date formats of the long store and of the wide CSV's column names
+LONG_DATE_FORMAT = '%Y-%m-%d'
+WIDE_DATE_FORMAT = '%m/%d/%Y'
+
+# Function to seed the long store from an existing wide playerdb.csv, once
+def migrate_wide_to_long(wide_path, long_path=long_file_path):
+    if os.path.exists(long_path) or not os.path.exists(wide_path):
+        return False
+
+    wide = pd.read_csv(wide_path, dtype={'Squad': str}, keep_default_na=False, na_values=[''])
+    wide['Squad'] = wide['Squad'].fillna('')
+    long = wide.melt(id_vars='Squad', var_name='date', value_name='players').dropna(subset=['players'])
+    long['date'] = pd.to_datetime(long['date'], format=WIDE_DATE_FORMAT).dt.strftime(LONG_DATE_FORMAT)
+    long['players'] = long['players'].astype(int)
+
+    # Keep the wide file's squad order within each date so exports round-trip
+    long = long.sort_values('date', kind='stable')
+    long.rename(columns={'Squad': 'squad'})[long_header].to_csv(long_path, index=False)
+    return True
+
+# Open the long store for appending one run's counts
+def open_long_store(long_path=long_file_path):
+    return CsvSink(long_path, header=long_header).open()
+
+# Function to append one run's (squad, players) counts for a date to the long store
+def append_counts(date, counts, long_path=long_file_path):
+    date = date.strftime(LONG_DATE_FORMAT)
+    with open_long_store(long_path) as store:
+        for squad, players in counts:
+            store.write([date, squad, players])
+
+# Function to read the wide CSV indexed by Squad
+def read_wide(wide_path):
+    wide = pd.read_csv(wide_path, dtype={'Squad': str}, keep_default_na=False, na_values=[''])
+    wide['Squad'] = wide['Squad'].fillna('')
+    return wide.set_index('Squad')
+
+# Function to write the wide CSV through a temporary file so the site never sees a half-written CSV
+def write_wide(wide, wide_path):
+    wide.to_csv(wide_path + '.tmp', quoting=csv.QUOTE_MINIMAL)
+    os.replace(wide_path + '.tmp', wide_path)
+
+# Add one date column to the wide CSV in a single vectorized step: new squads
+# are added in bulk with one reindex and the counts are assigned by index
+# alignment, so the frame is copied once per run rather than once per squad
+def update_wide(wide_path, date, counts):
+    column = date.strftime(WIDE_DATE_FORMAT)
+    counts = pd.Series(dict(counts), dtype=float)
+
+    if os.path.exists(wide_path):
+        wide = read_wide(wide_path)
+    else:
+        wide = pd.DataFrame(index=pd.Index([], name='Squad', dtype=str))
+
+    # New squads and the new date column come in with one reindex
+    new_squads = counts.index[~counts.index.isin(wide.index)]
+    columns = wide.columns if column in wide.columns else wide.columns.append(pd.Index([column]))
+    wide = wide.reindex(index=wide.index.append(new_squads), columns=columns)
+    wide.index.name = 'Squad'
+    wide[column] = counts
+    write_wide(wide, wide_path)
+    return wide
+
+# Pivot the long store into the wide CSV the site reads: one row per squad in
+# order of first appearance, one column per date in date order. A squad
+# counted twice on the same date keeps its last count.
+def export_wide(wide_path, long_path=long_file_path):
+    long = pd.read_csv(long_path, dtype={'squad': str}, keep_default_na=False, na_values=[''])
+    long['squad'] = long['squad'].fillna('')
+    long = long.drop_duplicates(subset=['date', 'squad'], keep='last')
+
+    wide = long.pivot(index='squad', columns='date', values='players')
+    wide = wide.reindex(index=long['squad'].unique(), columns=sorted(wide.columns))
+    wide.columns = [datetime.strptime(date, LONG_DATE_FORMAT).strftime(WIDE_DATE_FORMAT) for date in wide.columns]
+    wide.index.name = 'Squad'
+
+    wide = wide.astype(float)
+    write_wide(wide, wide_path)
+    return wide
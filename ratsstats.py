@@ -0,0 +1,174 @@
+import json
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# API URLs (RATS_BASE_URL points the client at another server, e.g. the local mock)
+base_url = os.getenv('RATS_BASE_URL', 'http://ratsstats.ddns.net').rstrip('/')
+player_list_url = base_url + "/get_player_list.php?squad=true"
+player_info_url = base_url + "/get_player_stats.php?uid={}"
+
+# Bulk stats URL taking comma-separated uids, if the server has one, and uids per bulk request
+player_bulk_url = os.getenv('RATS_BULK_URL', base_url + "/get_player_stats.php?uids={}")
+BULK_SIZE = int(os.getenv('RATS_BULK_SIZE', '50'))
+
+# How player stats are fetched: 'single', 'bulk' or 'dump:<path>'
+FETCH_STRATEGY = os.getenv('RATS_FETCH', 'single')
+
+# Credentials
+RATS_USER = os.getenv('RATS_USER')
+RATS_PASS = os.getenv('RATS_PASS')
+
+# Connection pool size and per-request timeouts (connect, read) in seconds
+POOL_SIZE = int(os.getenv('RATS_POOL_SIZE', '16'))
+CONNECT_TIMEOUT = float(os.getenv('RATS_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.getenv('RATS_READ_TIMEOUT', '30'))
+
+_session = None
+_pool_size = 0
+_session_lock = threading.Lock()
+_metrics = None
+
+# Function to mount a connection pool of `pool_size` keep-alive connections per host
+def mount_pool(session, pool_size):
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+# Function to create a keep-alive session with gzip and a sized connection pool
+def make_session(pool_size=POOL_SIZE, auth=None, accept='*/*'):
+    session = requests.Session()
+    session.auth = auth
+    session.headers.update({
+        'Accept': accept,
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+    mount_pool(session, pool_size)
+    return session
+
+# Function to get the shared session, creating it on first use. Every collector
+# goes through this one keep-alive pool instead of a new connection per uid.
+# Passing a larger pool_size (e.g. the crawler's worker count) grows the pool.
+def get_session(pool_size=None):
+    global _session, _pool_size
+    pool_size = max(pool_size or 0, POOL_SIZE)
+
+    with _session_lock:
+        if _session is None:
+            _session = make_session(pool_size, auth=(RATS_USER, RATS_PASS), accept='application/json')
+            _pool_size = pool_size
+        elif pool_size > _pool_size:
+            mount_pool(_session, pool_size)
+            _pool_size = pool_size
+        return _session
+
+# Function to close the shared session and its pooled connections
+def close_session():
+    global _session, _pool_size
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _pool_size = 0
+
+# Function to record request latency, bytes received and decode time into a
+# RunMetrics for every request from now on (None stops recording)
+def instrument(metrics):
+    global _metrics
+    _metrics = metrics
+
+# Function to GET a ratsstats URL and decode the JSON body
+def get_json(url):
+    metrics = _metrics
+    if metrics is None:
+        response = get_session().get(url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        response.raise_for_status()
+        return response.json()
+
+    start = time.perf_counter()
+    try:
+        response = get_session().get(url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    finally:
+        latency = time.perf_counter() - start
+        metrics.add_time('network', latency)
+        metrics.observe('request_latency_seconds', latency)
+    metrics.count('requests')
+    metrics.count('bytes_received', len(response.content))
+    if response.status_code >= 400:
+        metrics.count('http_errors')
+    response.raise_for_status()
+    with metrics.timer('decode'):
+        return response.json()
+
+# Function to get player list
+def get_player_list():
+    return get_json(player_list_url)
+
+# Function to get player info
+def get_player_info(uid):
+    return get_json(player_info_url.format(uid))
+
+# Batch fetch strategies. Each one takes a list of uids and returns
+# {uid: stats} for them, a missing or empty entry meaning no stats;
+# `batch_size` is how many uids the crawler hands to one fetch call.
+
+# One get_player_stats.php request per uid
+class SingleFetcher:
+    batch_size = 1
+
+    def fetch(self, uids):
+        return {uid: get_player_info(uid) for uid in uids}
+
+# One request for `batch_size` uids to a bulk endpoint answering either
+# {uid: stats} or a list of stats objects carrying their uid
+class BulkFetcher:
+    def __init__(self, url=None, batch_size=BULK_SIZE):
+        self.url = url or player_bulk_url
+        self.batch_size = max(1, batch_size)
+
+    def fetch(self, uids):
+        data = get_json(self.url.format(','.join(uids)))
+        if isinstance(data, list):
+            data = {player.get('uid'): player for player in data if isinstance(player, dict)}
+        return {uid: data.get(uid) for uid in uids}
+
+# Stats served from a cached dump (a JSON object {uid: stats}, or JSON lines of
+# stats objects carrying their uid); uids missing from it go to `fallback`
+class DumpFetcher:
+    def __init__(self, path, fallback=None):
+        self.players = load_dump(path)
+        self.fallback = fallback or SingleFetcher()
+        self.batch_size = self.fallback.batch_size
+
+    def fetch(self, uids):
+        players = {uid: self.players[uid] for uid in uids if uid in self.players}
+        missing = [uid for uid in uids if uid not in players]
+        if missing:
+            players.update(self.fallback.fetch(missing))
+        return players
+
+# Function to read a stats dump written as one JSON object or as JSON lines
+def load_dump(path):
+    with open(path, 'r') as file:
+        text = file.read()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        return data
+    return {player['uid']: player for player in data}
+
+# Function to build the fetch strategy named by `spec` ('single', 'bulk' or 'dump:<path>')
+def make_fetcher(spec=None):
+    spec = spec or FETCH_STRATEGY
+    if spec == 'single':
+        return SingleFetcher()
+    if spec == 'bulk':
+        return BulkFetcher()
+    if spec.startswith('dump:'):
+        return DumpFetcher(spec[len('dump:'):])
+    raise ValueError(f"Unknown fetch strategy {spec!r}, expected single, bulk or dump:<path>")
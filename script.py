@@ -1,8 +1,9 @@
-import requests
 import csv
 import os
 from datetime import datetime
 from tqdm import tqdm
+from ratsstats import get_player_list, get_player_info
+from sinks import CsvSink
 
 # CSV file location
 csv_file_path = 'data/wbuserdata.csv'  # Adjusted for GitHub Pages directory
@@ -71,29 +72,9 @@ damage_names = {
     'p126': 'G3A3'
 }
 
-# API URLs
-player_list_url = "http://ratsstats.ddns.net/get_player_list.php?squad=true"
-player_info_url = "http://ratsstats.ddns.net/get_player_stats.php?uid={}"
-
-# Credentials
-RATS_USER = os.getenv('RATS_USER')
-RATS_PASS = os.getenv('RATS_PASS')
-
 # Get the current date
 today = datetime.today().strftime('%d%m%Y')
 
-# Function to get player list
-def get_player_list():
-    response = requests.get(player_list_url, auth=(RATS_USER, RATS_PASS))
-    response.raise_for_status()
-    return response.json()
-
-# Function to get player info
-def get_player_info(uid):
-    response = requests.get(player_info_url.format(uid), auth=(RATS_USER, RATS_PASS))
-    response.raise_for_status()
-    return response.json()
-
 # Function to map damage dealt to human-readable names
 def map_damage_dealt(damage_dealt):
     return {damage_names.get(k, k): v for k, v in damage_dealt.items()}
@@ -115,8 +96,8 @@ players = get_player_list()
 # Calculate total number of players for the progress bar
 total_players = len(players)
 
-# Create a progress bar for processing players
-with tqdm(total=total_players, desc="Processing Players", unit="player") as progress_bar:
+# Create a progress bar for processing players; rows go through one open buffered writer
+with CsvSink(csv_file_path) as sink, tqdm(total=total_players, desc="Processing Players", unit="player") as progress_bar:
     for player in players:
         try:
             player_info = get_player_info(player['uid'])
@@ -138,29 +119,27 @@ with tqdm(total=total_players, desc="Processing Players", unit="player") as prog
                 player['uid'],  # Add UserID to the row
                 player_info.get('level'),
                 player_info.get('xp'),
-                    player_info.get('joinTime'),
-                    player_info.get('ping_time'),
-                    player_info.get('banned'),
-                    player_info.get('coins'),
-                    player_info.get('killsELO'),
-                    player_info.get('gamesELO'),
-                    player_info.get('number_of_jumps'),
-                    player_info.get('zombie_deaths'),
-                    player_info.get('zombie_kills'),
-                    player_info.get('zombie_wins'),
-                    player_info.get('time'),
-                    player_info.get('time_alive_count'),
-                    player_info.get('time_alive_longest'),
-                    player_info.get('time_alive'),
-                    player_info.get('zombie_time_alive_count'),
-                    player_info.get('zombie_time_alive')
-                ] + [damage_dealt.get(name, 0) for name in damage_names.values()] \
-                  + [losses.get(key, 0) for key in ['m00', 'm10', 'm09', 'm08', 'm07']]
-
-                # Append data to the CSV file
-                with open(csv_file_path, 'a', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow(row)
+                player_info.get('joinTime'),
+                player_info.get('ping_time'),
+                player_info.get('banned'),
+                player_info.get('coins'),
+                player_info.get('killsELO'),
+                player_info.get('gamesELO'),
+                player_info.get('number_of_jumps'),
+                player_info.get('zombie_deaths'),
+                player_info.get('zombie_kills'),
+                player_info.get('zombie_wins'),
+                player_info.get('time'),
+                player_info.get('time_alive_count'),
+                player_info.get('time_alive_longest'),
+                player_info.get('time_alive'),
+                player_info.get('zombie_time_alive_count'),
+                player_info.get('zombie_time_alive')
+            ] + [damage_dealt.get(name, 0) for name in damage_names.values()] \
+              + [losses.get(key, 0) for key in ['m00', 'm10', 'm09', 'm08', 'm07']]
+
+            # Append data to the CSV file
+            sink.write(row)
 
         except Exception as e:
             print(f"Error processing user {player['uid']}: {e}")
@@ -0,0 +1,551 @@
+import csv
+import glob
+import gzip
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+from checkpoint import uids_written_for_date, reverse_lines
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Default batch size and interval between flushes of buffered rows
+DEFAULT_FLUSH_ROWS = int(os.getenv('WBTSDB_FLUSH_ROWS', '500'))
+DEFAULT_FLUSH_INTERVAL = float(os.getenv('WBTSDB_FLUSH_INTERVAL', '5'))
+
+# Date format used by the crawlers' Date column
+DATE_FORMAT = '%m%d%Y'
+
+# Columns stored as text in typed backends; every other column is numeric
+string_columns = {'Date', 'Squad', 'Name', 'UserID'}
+
+# Function to cut a trailing partial line left behind by a crash mid-write
+def repair_partial_line(path):
+    with open(path, 'rb+') as file:
+        size = file.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        file.seek(size - 1)
+        if file.read(1) == b'\n':
+            return
+
+        # Walk back to the last complete line and truncate after it
+        position = size
+        while position > 0:
+            step = min(1 << 16, position)
+            position -= step
+            file.seek(position)
+            index = file.read(step).rfind(b'\n')
+            if index != -1:
+                file.truncate(position + index + 1)
+                return
+        file.truncate(0)
+
+# Function to read the most recent header line of a CSV, i.e. the layout its
+# last rows are in, or None for a file without one. The file is searched
+# backwards block by block for a line starting with "Date,", so only the rows
+# written since the last layout change are scanned.
+def last_header(path, block_size=1 << 20):
+    marker = b'\nDate,'
+    with open(path, 'rb') as file:
+        position = file.seek(0, os.SEEK_END)
+        overlap = b''
+        start = None
+        while position > 0 and start is None:
+            step = min(block_size, position)
+            position -= step
+            file.seek(position)
+            block = file.read(step) + overlap
+            index = block.rfind(marker)
+            if index != -1:
+                start = position + index + 1
+            elif position == 0 and block.startswith(marker[1:]):
+                start = 0
+            # Keep the start of the block in case a marker straddles two blocks
+            overlap = block[:len(marker) - 1]
+        if start is None:
+            return None
+        file.seek(start)
+        return next(csv.reader([file.readline().decode('utf-8', errors='replace')]), None)
+
+# Function to tell whether rows in the `header` layout need a header line in
+# front of them: the file is empty, or the header its last rows are under is a
+# different one. Readers (tsreader, csv_index) switch to the layout of each
+# header line they meet, so a file started under an older layout gets the new
+# header once, where the layout changes, rather than being rewritten.
+def needs_header(path, header):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return True
+    return last_header(path) != list(header)
+
+# Append-only CSV output kept open for the whole run. Rows are buffered in
+# memory and written as one block of complete lines every `flush_rows` rows or
+# `flush_interval` seconds; commit() also fsyncs. `on_flush` is called with the
+# keys of the rows that just reached the file (e.g. to update a checkpoint).
+# An `index` (csv_index.CsvIndex) is brought up to date after every flush.
+class CsvSink:
+    def __init__(self, path, header=None, flush_rows=DEFAULT_FLUSH_ROWS,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, on_flush=None, index=None):
+        self.path = path
+        self.header = header
+        self.index = index
+        self.pending_header = False
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.file = None
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.keys = []
+        self.rows = 0
+        self.last_flush = time.monotonic()
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if os.path.exists(self.path):
+            repair_partial_line(self.path)
+        if self.index is not None:
+            # Catch the index up with rows appended without it
+            self.index.load().update()
+        # A file under another layout gets the header in front of the first row
+        self.pending_header = bool(self.header) and needs_header(self.path, self.header)
+        self.file = open(self.path, 'a', newline='', buffering=1 << 20)
+        if self.pending_header and self.file.tell() == 0:
+            self.writer.writerow(self.header)
+            self.pending_header = False
+            self.commit()
+        return self
+
+    def write(self, row, key=None):
+        if self.pending_header:
+            self.writer.writerow(self.header)
+            self.pending_header = False
+        self.writer.writerow(row)
+        self.rows += 1
+        if key is not None:
+            self.keys.append(key)
+        if self.rows >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    # Write the buffered rows to the file in one block
+    def flush(self):
+        data = self.buffer.getvalue()
+        if data:
+            self.file.write(data)
+            self.file.flush()
+            self.buffer.seek(0)
+            self.buffer.truncate()
+            if self.index is not None:
+                self.index.update()
+        keys, self.keys, self.rows = self.keys, [], 0
+        self.last_flush = time.monotonic()
+        if keys and self.on_flush:
+            self.on_flush(keys)
+
+    # Flush and force the rows to disk
+    def commit(self):
+        self.flush()
+        os.fsync(self.file.fileno())
+
+    # UserIDs already in the file for `date` (only the trailing date block is read)
+    def written_uids(self, date):
+        if self.header:
+            date_index, uid_index = self.header.index('Date'), self.header.index('UserID')
+        else:
+            date_index, uid_index = 0, 3
+        return uids_written_for_date(self.path, date, date_index, uid_index)
+
+    def close(self):
+        if self.file is not None:
+            self.commit()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        if self.file is None:
+            self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Function to read delta records from a delta log, starting at a byte offset
+def read_delta_log(path, offset=0):
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as file:
+        file.seek(offset)
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+# Function to load the cached last-known state of a delta log and the log offset it covers
+def load_delta_state(state_path):
+    if not os.path.exists(state_path):
+        return {}, 0
+    with gzip.open(state_path, 'rt') as file:
+        saved = json.load(file)
+    return saved['players'], saved['offset']
+
+# Delta output for a player base that is mostly idle. The sink keeps the last
+# known value of every column per uid and appends one JSON line per player
+# whose stats changed, holding only the changed columns; unchanged players
+# write nothing. The gzipped state file caches the log up to a byte offset and
+# any lines past it are replayed on open, so it is never stale after a crash.
+class DeltaSink(CsvSink):
+    def __init__(self, path, state_path, columns, defaults, date, **kwargs):
+        super().__init__(path, **kwargs)
+        self.state_path = state_path
+        self.columns = list(columns)
+        self.defaults = list(defaults)
+        self.date = date
+        self.uid_index = self.columns.index('UserID')
+        self.skip = {'Date', 'UserID'}
+        self.state = {}
+
+    def open(self):
+        super().open()
+        self.state, offset = load_delta_state(self.state_path)
+        for record in read_delta_log(self.path, offset):
+            self.state.setdefault(record['UserID'], {}).update(record['changes'])
+        return self
+
+    def write(self, row, key=None):
+        uid = row[self.uid_index]
+        previous = self.state.get(uid)
+        known = previous or {}
+        changes = {column: value for column, value, default in zip(self.columns, row, self.defaults)
+                   if column not in self.skip and known.get(column, default) != value}
+
+        # Always record a player the first time it is seen, even with all-default stats
+        if changes or previous is None:
+            self.state.setdefault(uid, {}).update(changes)
+            record = {'Date': self.date, 'UserID': uid, 'changes': changes}
+            self.buffer.write(json.dumps(record, separators=(',', ':')) + '\n')
+            self.rows += 1
+        if key is not None:
+            self.keys.append(key)
+        if self.rows >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def close(self):
+        if self.file is None:
+            return
+        super().close()
+
+        # Save the state together with the log size it reflects
+        saved = {'offset': os.path.getsize(self.path), 'players': self.state}
+        with gzip.open(self.state_path + '.tmp', 'wt') as file:
+            json.dump(saved, file, separators=(',', ':'))
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    # UserIDs with a delta record for `date` at the end of the log
+    def written_uids(self, date):
+        uids = set()
+        if not os.path.exists(self.path):
+            return uids
+        for line in reverse_lines(self.path):
+            record = json.loads(line)
+            if record['Date'] != date:
+                break
+            uids.add(record['UserID'])
+        return uids
+
+# Function to get the partition directory name for a crawl date, e.g. 10182026 -> date=2026-10-18
+def partition_name(date):
+    return 'date=' + datetime.strptime(date, DATE_FORMAT).strftime('%Y-%m-%d')
+
+# Function to convert a raw API value for a numeric column
+def _to_number(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+# Columnar output: one directory per crawl date under `root`, holding
+# zstd-compressed Parquet files with a fixed, typed schema. Each flush writes a
+# complete part file under a temporary name and renames it into place, so a
+# crash never leaves a partial file in the partition.
+class ParquetSink:
+    def __init__(self, root, columns, date, flush_rows=50000, on_flush=None):
+        if pa is None:
+            raise ImportError("pyarrow is required for the Parquet backend (pip install pyarrow)")
+        self.root = root
+        self.columns = list(columns)
+        self.date = date
+        self.flush_rows = flush_rows
+        self.on_flush = on_flush
+        self.partition = os.path.join(root, partition_name(date))
+        self.schema = pa.schema([(column, pa.string() if column in string_columns else pa.float64())
+                                 for column in self.columns])
+        self.rows = []
+        self.keys = []
+
+    def open(self):
+        os.makedirs(self.partition, exist_ok=True)
+        # Drop temporary files left by an interrupted flush
+        for path in glob.glob(os.path.join(self.partition, '*.tmp')):
+            os.remove(path)
+        return self
+
+    def write(self, row, key=None):
+        self.rows.append(row)
+        if key is not None:
+            self.keys.append(key)
+        if len(self.rows) >= self.flush_rows:
+            self.flush()
+
+    # Write the buffered rows as one new part file
+    def flush(self):
+        if self.rows:
+            arrays = []
+            for column, values in zip(self.columns, zip(*self.rows)):
+                if column in string_columns:
+                    values = [None if value is None else str(value) for value in values]
+                else:
+                    values = [_to_number(value) for value in values]
+                arrays.append(pa.array(values, type=self.schema.field(column).type))
+            table = pa.Table.from_arrays(arrays, schema=self.schema)
+
+            part = len(glob.glob(os.path.join(self.partition, 'part-*.parquet')))
+            path = os.path.join(self.partition, f"part-{part:05d}.parquet")
+            pq.write_table(table, path + '.tmp', compression='zstd')
+            os.replace(path + '.tmp', path)
+
+        keys, self.keys, self.rows = self.keys, [], []
+        if keys and self.on_flush:
+            self.on_flush(keys)
+
+    def commit(self):
+        self.flush()
+
+    def close(self):
+        self.commit()
+
+    # UserIDs already written to this date's partition
+    def written_uids(self, date):
+        uids = set()
+        partition = os.path.join(self.root, partition_name(date))
+        for path in glob.glob(os.path.join(partition, 'part-*.parquet')):
+            uids.update(pq.read_table(path, columns=['UserID']).column('UserID').to_pylist())
+        return uids
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Default number of rows per upsert request
+DEFAULT_BATCH_SIZE = int(os.getenv('WBTSDB_BATCH_SIZE', '500'))
+
+# Upsert target backed by a Supabase (PostgREST) table; re-sending a
+# (Date, UserID) row updates it instead of inserting a duplicate
+class SupabaseTable:
+    def __init__(self, client, table, key=('Date', 'UserID')):
+        self.client = client
+        self.table = table
+        self.on_conflict = ','.join(key)
+
+    def upsert(self, rows):
+        self.client.table(self.table).upsert(rows, on_conflict=self.on_conflict).execute()
+
+    # Columns the table has, read off one of its rows (None while it is empty)
+    def table_columns(self):
+        rows = self.client.table(self.table).select('*').limit(1).execute().data
+        return set(rows[0]) if rows else None
+
+# Local stand-in for SupabaseTable with the same upsert semantics, for
+# measuring the loader without a live project. Columns are added as new keys
+# show up, the way the wide stats rows grow over time.
+class SqliteTable:
+    def __init__(self, path, table='wbtsdb', key=('Date', 'UserID')):
+        import sqlite3
+        self.connection = sqlite3.connect(path)
+        self.table = table
+        self.key = list(key)
+        self.columns = set()
+        key_columns = ', '.join(f'"{column}"' for column in self.key)
+        self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({key_columns}, PRIMARY KEY ({key_columns}))')
+        self.columns.update(row[1] for row in self.connection.execute(f'PRAGMA table_info("{table}")'))
+
+    # Any column is accepted, since missing ones are added
+    def table_columns(self):
+        return None
+
+    def upsert(self, rows):
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        with self.connection:
+            for column in columns:
+                if column not in self.columns:
+                    self.connection.execute(f'ALTER TABLE "{self.table}" ADD COLUMN "{column}"')
+                    self.columns.add(column)
+
+            names = ', '.join(f'"{column}"' for column in columns)
+            placeholders = ', '.join('?' for _ in columns)
+            updates = ', '.join(f'"{column}" = excluded."{column}"' for column in columns if column not in self.key)
+            conflict = ', '.join(f'"{column}"' for column in self.key)
+            self.connection.executemany(
+                f'INSERT INTO "{self.table}" ({names}) VALUES ({placeholders}) '
+                f'ON CONFLICT ({conflict}) DO ' + (f'UPDATE SET {updates}' if updates else 'NOTHING'),
+                [[row.get(column) for column in columns] for row in rows])
+
+    def close(self):
+        self.connection.close()
+
+# Batching loader for dict rows: rows are buffered and sent to `table` in
+# chunks of `batch_size` upserts. A chunk that fails is split in half and
+# each half retried, down to single rows, so one bad row only costs itself;
+# rows that still fail are kept in `failed` with their error. On open, rows
+# are narrowed to the columns the table has (table.table_columns()), since
+# one column it lacks would make PostgREST reject every request.
+class UpsertSink:
+    def __init__(self, table, batch_size=DEFAULT_BATCH_SIZE, on_flush=None, columns=None):
+        self.table = table
+        self.columns = columns
+        self.keep = None
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.pending = []
+        self.sent = 0
+        self.requests = 0
+        self.failed = []
+        self.started = time.monotonic()
+
+    def open(self):
+        self.started = time.monotonic()
+        self.keep = self.table.table_columns()
+        if self.keep is not None and self.columns is not None:
+            missing = [column for column in self.columns if column not in self.keep]
+            if missing:
+                print(f"{len(missing)} columns not in the table are left out, e.g. {', '.join(missing[:5])}")
+        return self
+
+    def write(self, row, key=None):
+        # List rows in schema order are sent as {column: value} objects
+        if self.columns is not None and not isinstance(row, dict):
+            row = dict(zip(self.columns, row))
+        if self.keep is not None:
+            row = {column: value for column, value in row.items() if column in self.keep}
+        self.pending.append((row, key))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    # Upsert (row, key) pairs, halving on failure; returns the keys that made it
+    def _send(self, items):
+        self.requests += 1
+        try:
+            self.table.upsert([row for row, _ in items])
+        except Exception as e:
+            if len(items) == 1:
+                row, _ = items[0]
+                self.failed.append((row, e))
+                print(f"Error upserting user {row.get('UserID')}: {e}")
+                return []
+            middle = len(items) // 2
+            return self._send(items[:middle]) + self._send(items[middle:])
+        self.sent += len(items)
+        return [key for _, key in items if key is not None]
+
+    def flush(self):
+        items, self.pending = self.pending, []
+        keys = self._send(items) if items else []
+        if keys and self.on_flush:
+            self.on_flush(keys)
+
+    def commit(self):
+        self.flush()
+
+    def close(self):
+        self.commit()
+
+    # The table can't be asked which rows it holds, so nothing counts as
+    # written: only keys journalled after an upsert are skipped on resume
+    def written_uids(self, date):
+        return None
+
+    # Rows per second sent since the sink was opened
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Sink that writes every row to several sinks in one pass. A key is reported
+# through `on_flush` only once every sink has flushed it. On resume, a key is
+# only skipped if every sink already holds it (a sink whose written_uids() is
+# None holds nothing), and a refetched row is not written again to the sinks
+# that already have it.
+class FanOutSink:
+    def __init__(self, sinks, on_flush=None):
+        self.sinks = list(sinks)
+        self.on_flush = on_flush
+        self.flushed = {}
+        self.written = [set() for _ in self.sinks]
+        self.opened = False
+        for sink in self.sinks:
+            sink.on_flush = self._flushed
+
+    def _flushed(self, keys):
+        done = []
+        for key in keys:
+            count = self.flushed.get(key, 0) + 1
+            if count == len(self.sinks):
+                self.flushed.pop(key, None)
+                done.append(key)
+            else:
+                self.flushed[key] = count
+        if done and self.on_flush:
+            self.on_flush(done)
+
+    def open(self):
+        if not self.opened:
+            for sink in self.sinks:
+                sink.open()
+            self.opened = True
+        return self
+
+    def written_uids(self, date):
+        for index, sink in enumerate(self.sinks):
+            self.written[index] = sink.written_uids(date) or set()
+        return set.intersection(*self.written) if self.written else set()
+
+    def write(self, row, key=None):
+        skipped = []
+        for sink, written in zip(self.sinks, self.written):
+            if key is not None and key in written:
+                skipped.append(key)
+            else:
+                sink.write(row, key)
+        if skipped:
+            self._flushed(skipped)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def commit(self):
+        for sink in self.sinks:
+            sink.commit()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,146 @@
+import os
+import sqlite3
+from datetime import datetime
+
+from sinks import DATE_FORMAT, DEFAULT_FLUSH_ROWS, string_columns
+
+# Base columns that get a (Date, column) index for per-date leaderboards
+ranked_columns = ['Level', 'XP', 'Coins', 'KillsELO', 'GamesELO', 'Time']
+
+# Function to turn a crawl date ('10182026') into the store's sortable ISO date
+def iso_date(date):
+    return datetime.strptime(date, DATE_FORMAT).strftime('%Y-%m-%d')
+
+# Function to build the CREATE statements of the normalized store:
+#   players      one row per UserID with its latest Name/Squad and first/last crawl date
+#   snapshots    the top-level fields of every (UserID, Date) crawl
+#   <category>   one table per counter category holding (UserID, Date, metric, value)
+#                for the non-zero counters only; a missing metric means 0
+def schema_statements(schema):
+    base = [column for column in schema.columns if column not in schema.metrics and column not in ('Date', 'UserID')]
+    statements = [
+        'CREATE TABLE IF NOT EXISTS players (UserID TEXT PRIMARY KEY, Name TEXT, Squad TEXT, '
+        'first_seen TEXT, last_seen TEXT) WITHOUT ROWID',
+        'CREATE TABLE IF NOT EXISTS snapshots (UserID TEXT, Date TEXT, '
+        + ', '.join(f'"{column}" {"TEXT" if column in string_columns else "NUMERIC"}' for column in base)
+        + ', PRIMARY KEY (UserID, Date)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS snapshots_date ON snapshots (Date)',
+    ]
+    statements += [f'CREATE INDEX IF NOT EXISTS snapshots_date_{column} ON snapshots (Date, "{column}")'
+                   for column in ranked_columns if column in base]
+    for category, _, _ in schema.categories:
+        statements += [
+            f'CREATE TABLE IF NOT EXISTS {category} (UserID TEXT, Date TEXT, metric TEXT, value NUMERIC, '
+            f'PRIMARY KEY (UserID, Date, metric)) WITHOUT ROWID',
+            f'CREATE INDEX IF NOT EXISTS {category}_date_metric ON {category} (Date, metric, value)',
+        ]
+    return statements
+
+# Function to open (and create) the store with write-ahead logging
+def connect(path, schema=None):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    if schema is not None:
+        for statement in schema_statements(schema):
+            connection.execute(statement)
+    return connection
+
+# Sink for the normalized SQLite store. Rows in schema order are split into
+# the players, snapshots and counter tables and bulk inserted in batches of
+# `flush_rows`, all inside one transaction per crawl: the crawl's rows become
+# visible, and `on_flush` reports their uids, only when the sink is closed.
+class SqliteStore:
+    def __init__(self, path, schema, date, flush_rows=DEFAULT_FLUSH_ROWS, on_flush=None):
+        self.path = path
+        self.schema = schema
+        self.date = iso_date(date)
+        self.flush_rows = flush_rows
+        self.on_flush = on_flush
+        self.connection = None
+        self.pending = []
+        self.keys = []
+        self.existing = set()
+
+        # Column positions of the snapshot fields and of each category's counters
+        self.base = [(index, column) for index, column in enumerate(schema.columns)
+                     if column not in schema.metrics and column not in ('Date', 'UserID')]
+        self.uid_index, self.name_index, self.squad_index = (
+            schema.columns.index(column) for column in ('UserID', 'Name', 'Squad'))
+        self.counters = {}
+        for index, column in enumerate(schema.columns):
+            if column in schema.metrics:
+                category, key = schema.metrics[column]
+                self.counters.setdefault(category, []).append((index, key))
+
+        names = ', '.join(f'"{column}"' for _, column in self.base)
+        placeholders = ', '.join('?' for _ in self.base)
+        self.insert_snapshot = f'INSERT OR REPLACE INTO snapshots (UserID, Date, {names}) VALUES (?, ?, {placeholders})'
+        self.upsert_player = (
+            'INSERT INTO players (UserID, Name, Squad, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (UserID) DO UPDATE SET '
+            'Name = CASE WHEN excluded.last_seen >= last_seen THEN excluded.Name ELSE Name END, '
+            'Squad = CASE WHEN excluded.last_seen >= last_seen THEN excluded.Squad ELSE Squad END, '
+            'first_seen = min(first_seen, excluded.first_seen), last_seen = max(last_seen, excluded.last_seen)')
+
+    def open(self):
+        if self.connection is None:
+            self.connection = connect(self.path, self.schema)
+            self.existing = self.written_uids(None)
+            self.connection.execute('BEGIN')
+        return self
+
+    def write(self, row, key=None):
+        self.pending.append(row)
+        if key is not None:
+            self.keys.append(key)
+        if len(self.pending) >= self.flush_rows:
+            self.flush()
+
+    # Insert the buffered rows into the open transaction
+    def flush(self):
+        rows, self.pending = self.pending, []
+        if not rows:
+            return
+        uid_index, name_index, squad_index = self.uid_index, self.name_index, self.squad_index
+        date = self.date
+
+        # A uid crawled again for the same date replaces its earlier counters
+        replaced = [(row[uid_index], date) for row in rows if row[uid_index] in self.existing]
+        for category in self.counters:
+            self.connection.executemany(f'DELETE FROM {category} WHERE UserID = ? AND Date = ?', replaced)
+
+        self.connection.executemany(self.upsert_player, [
+            (row[uid_index], row[name_index], row[squad_index], date, date) for row in rows])
+        self.connection.executemany(self.insert_snapshot, [
+            [row[uid_index], date] + [row[index] for index, _ in self.base] for row in rows])
+        for category, counters in self.counters.items():
+            self.connection.executemany(f'INSERT OR REPLACE INTO {category} VALUES (?, ?, ?, ?)', [
+                (row[uid_index], date, key, row[index]) for row in rows for index, key in counters if row[index]])
+
+    # Flush and commit the crawl's transaction, then report its uids as written
+    def commit(self):
+        self.flush()
+        self.connection.execute('COMMIT')
+        keys, self.keys = self.keys, []
+        if keys and self.on_flush:
+            self.on_flush(keys)
+        self.connection.execute('BEGIN')
+
+    # UserIDs already stored for `date` (the sink's own date when None)
+    def written_uids(self, date):
+        date = self.date if date is None else iso_date(date)
+        return {uid for uid, in self.connection.execute('SELECT UserID FROM snapshots WHERE Date = ?', (date,))}
+
+    def close(self):
+        if self.connection is not None:
+            self.commit()
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,97 @@
+import codecs
+import hashlib
+import os
+from html.parser import HTMLParser
+
+from ratsstats import make_session, CONNECT_TIMEOUT, READ_TIMEOUT
+from crawler import fetch_concurrently, CrawlScheduler
+from http_cache import conditional_headers
+
+base_url = 'https://stats.warbrokers.io/squads'
+
+# Default number of squad pages fetched at once and request rate limit
+DEFAULT_WORKERS = int(os.getenv('PLAYERDB_WORKERS', '8'))
+DEFAULT_RATE = float(os.getenv('PLAYERDB_RATE', '10'))
+
+# Location and size cap of the squad page cache
+cache_file_path = './.cache/squad_pages.json'
+CACHE_ENTRIES = int(os.getenv('PLAYERDB_CACHE_ENTRIES', '5000'))
+
+# Streaming <a href> extractor: fed the page chunk by chunk as it downloads and
+# only looks at anchor tags, counting (and optionally keeping) hrefs that
+# contain `pattern`. No document tree is ever built.
+class LinkExtractor(HTMLParser):
+    def __init__(self, pattern, collect=False):
+        super().__init__()
+        self.pattern = pattern
+        self.collect = collect
+        self.count = 0
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+        for name, value in attrs:
+            if name == 'href' and value and self.pattern in value:
+                self.count += 1
+                if self.collect:
+                    self.links.append(value)
+
+# Function to download a page and run it through a LinkExtractor as it streams in
+def extract_links(session, url, pattern, collect=False):
+    extractor = LinkExtractor(pattern, collect)
+    with session.get(url, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+        response.raise_for_status()
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        for chunk in response.iter_content(chunk_size=1 << 14):
+            extractor.feed(decoder.decode(chunk))
+        extractor.feed(decoder.decode(b'', final=True))
+    extractor.close()
+    return extractor
+
+# Function to list squad names from the squads index page
+def get_squad_names(session):
+    links = extract_links(session, base_url, '/squads/', collect=True).links
+    return [link.replace('/squads/', '') for link in links]
+
+# Function to count the players linked from one squad page. With a cache the
+# request is conditional: a 304, or a body whose hash matches the cached one,
+# returns the cached count without parsing the page.
+def count_squad_players(session, squad, cache=None):
+    url = base_url + '/' + squad
+    if cache is None:
+        return extract_links(session, url, '/players/i/').count
+
+    entry = cache.get(url)
+    response = session.get(url, headers=conditional_headers(entry), timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    if response.status_code == 304 and entry is not None:
+        cache.record(hit=True)
+        return entry['players']
+    response.raise_for_status()
+
+    body_hash = hashlib.sha1(response.content).hexdigest()
+    if entry is not None and entry.get('hash') == body_hash:
+        cache.record(hit=True)
+        players = entry['players']
+    else:
+        cache.record(hit=False)
+        extractor = LinkExtractor('/players/i/')
+        extractor.feed(response.text)
+        extractor.close()
+        players = extractor.count
+
+    cache.put(url, {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'hash': body_hash,
+        'players': players,
+    })
+    return players
+
+# Scrape every squad page with a bounded, rate-limited worker pool over one
+# shared keep-alive session. Yields (squad, players, error) as pages finish.
+def scrape_squad_counts(squads, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, session=None, cache=None):
+    session = session or make_session(pool_size=workers, accept='text/html')
+    scheduler = CrawlScheduler(workers=workers, rate=rate)
+    return fetch_concurrently(squads, lambda squad: count_squad_players(session, squad, cache),
+                              scheduler=scheduler)
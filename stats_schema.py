@@ -0,0 +1,209 @@
+import json
+from collections import Counter
+
+# Mapping for human-readable names for weapons (damage dealt, kills, shots, ...)
+damage_names = {
+    'p09': 'AirStrike',
+    'p11': 'BGM',
+    'p52': 'TankLvl1',
+    'p53': 'APCLvl1',
+    'p54': 'HeliLvl1',
+    'p55': 'TankLvl2',
+    'p56': 'APCLvl2',
+    'p57': 'HeliLvl2',
+    'p58': 'TankLvl3',
+    'p59': 'APCLvl3',
+    'p60': 'HeliLvl3',
+    'p61': 'ARRifle',
+    'p62': 'AKRifle',
+    'p63': 'Pistol',
+    'p64': 'HuntingRifle',
+    'p65': 'RPG',
+    'p66': 'Shotgun',
+    'p67': 'SniperRifle',
+    'p68': 'SMG',
+    'p69': 'Homing',
+    'p71': 'Grenade',
+    'p74': 'HeliMinigun',
+    'p75': 'TankMinigun',
+    'p76': 'Knife',
+    'p78': 'Revolver',
+    'p79': 'Minigun',
+    'p80': 'GrenadeLauncher',
+    'p81': 'SmokeGrenade',
+    'p82': 'Jet1Rockets',
+    'p83': 'Jet1Homing',
+    'p84': 'Jet1MachineGun',
+    'p85': 'Jet2Rockets',
+    'p86': 'Jet2Homing',
+    'p87': 'Jet2MachineGun',
+    'p88': 'Fists',
+    'p89': 'VSS',
+    'p90': 'FiftyCalSniper',
+    'p91': 'MGTurret',
+    'p92': 'Crossbow',
+    'p93': 'SCAR',
+    'p94': 'TacticalShotgun',
+    'p95': 'VEK',
+    'p96': 'Desert',
+    'p97': 'Auto',
+    'p98': 'LMG',
+    'p99': 'b/k',
+    'p100': 'Mace',
+    'p101': 'RubberChicken',
+    'p102': 'Butterfly',
+    'p103': 'Chainsaw',
+    'p104': 'AKSMG',
+    'p105': 'AutoSniper',
+    'p106': 'G36',
+    'p107': 'SawedOff',
+    'p108': 'HealingPistol',
+    'p109': 'MP7',
+    'p110': 'ImplosionGrenade',
+    'p111': 'LaserTripMine',
+    'p112': 'ConcussionGrenade',
+    'p126': 'G3A3',
+    'p128': 'MarksmanRifle',
+    'p129': 'Mutant',
+}
+
+# Game mode keys used by wins/losses
+mode_keys = ['m00', 'm01', 'm02', 'm03', 'm04', 'm05', 'm06', 'm07', 'm08', 'm09', 'm10',
+             'm11', 'm12', 'm13', 'm14', 'm15']
+
+# Vehicle keys used by self destructs, distance driven and kills per vehicle
+vehicle_keys = ['v00', 'v01', 'v02', 'v10', 'v11', 'v12', 'v13', 'v14', 'v15', 'v16', 'v17', 'v18',
+                'v19', 'v20', 'v21', 'v22', 'v23', 'v30', 'v40', 'v41', 'v50', 'v60', 'v110', 'v111',
+                'v112', 'v113']
+
+# Top-level fields as (CSV column, API key); Date and UserID are filled in by the crawler
+base_fields = [
+    ('Date', None),
+    ('Squad', 'squad'),
+    ('Name', 'nick'),
+    ('UserID', None),
+    ('Level', 'level'),
+    ('XP', 'xp'),
+    ('JoinTime', 'joinTime'),
+    ('PingTime', 'ping_time'),
+    ('Banned', 'banned'),
+    ('Coins', 'coins'),
+    ('KillsELO', 'killsELO'),
+    ('GamesELO', 'gamesELO'),
+    ('Number_of_Jumps', 'number_of_jumps'),
+    ('Zombie_Deaths', 'zombie_deaths'),
+    ('Zombie_Kills', 'zombie_kills'),
+    ('Zombie_Wins', 'zombie_wins'),
+    ('Time', 'time'),
+    ('Time_Alive_Count', 'time_alive_count'),
+    ('Time_Alive_Longest', 'time_alive_longest'),
+    ('Time_Alive', 'time_alive'),
+    ('Zombie_Time_Alive_Count', 'zombie_time_alive_count'),
+    ('Zombie_Time_Alive', 'zombie_time_alive'),
+    ('Scuds_Launched', 'scuds_launched'),
+]
+
+# Nested counter categories in column order, with the keys each one is expected to have
+weapon_keys = list(damage_names)
+categories = [
+    ('wins', mode_keys),
+    ('losses', mode_keys),
+    ('self_destructs', vehicle_keys),
+    ('distance_driven', vehicle_keys),
+    ('distance_driven_count', vehicle_keys),
+    ('kills_per_vehicle', vehicle_keys),
+    ('shots_fired_unzoomed', weapon_keys),
+    ('shots_fired_zoomed', weapon_keys),
+    ('shots_hit_unzoomed', weapon_keys),
+    ('shots_hit_zoomed', weapon_keys),
+    ('damage_dealt', weapon_keys),
+    ('damage_received', weapon_keys),
+    ('kills_per_weapon', weapon_keys),
+    ('deaths', weapon_keys),
+    ('headshots', weapon_keys),
+]
+
+# Function to build the column name for a category key, e.g. ('kills_per_weapon', 'p61') -> Kills_Per_Weapon_ARRifle
+def column_name(category, key):
+    prefix = '_'.join(part.capitalize() for part in category.split('_'))
+    return f"{prefix}_{damage_names.get(key, key)}"
+
+# The Supabase `wbtsdb` table was created from the first wbtsdb_sb.py rows,
+# which named counter columns after the raw API keys in lowercase (wins_m00,
+# kills_per_weapon_total); only damage_dealt used readable names, from an
+# older mapping that called p99 KBAR and had no p128/p129
+legacy_damage_names = {**{key: name for key, name in damage_names.items() if key not in ('p128', 'p129')},
+                       'p99': 'KBAR'}
+
+# Function to build the Supabase column name for a category key, e.g. ('damage_dealt', 'p61') -> damage_dealt_ARRifle
+def legacy_column_name(category, key):
+    if category == 'damage_dealt':
+        key = legacy_damage_names.get(key, key)
+    return f"{category}_{key}"
+
+# Fixed column layout for the wide stats CSV. Every (category, key) pair maps
+# to one column index, computed once, so a player's row never depends on the
+# key order or key set the API returns. Keys outside the schema still count
+# towards the category total and are tallied in `unknown` for reporting.
+# `metrics` maps each counter column back to its (category, API key), and
+# `legacy_columns` are the same columns under their Supabase table names.
+class StatsSchema:
+    def __init__(self, base_fields=base_fields, categories=categories):
+        self.columns = [column for column, _ in base_fields]
+        self.legacy_columns = list(self.columns)
+        self.base = [(index, key) for index, (_, key) in enumerate(base_fields) if key is not None]
+        self.date_index = self.columns.index('Date')
+        self.uid_index = self.columns.index('UserID')
+        self.categories = []
+        self.metrics = {}
+        self.unknown = Counter()
+
+        for category, keys in categories:
+            index = {}
+            for key in keys:
+                index[key] = len(self.columns)
+                # Also accept the human-readable name in case the API sends it
+                index.setdefault(damage_names.get(key, key), len(self.columns))
+                self.columns.append(column_name(category, key))
+                self.legacy_columns.append(legacy_column_name(category, key))
+                self.metrics[self.columns[-1]] = (category, key)
+            total_index = len(self.columns)
+            self.columns.append(column_name(category, 'total'))
+            self.legacy_columns.append(legacy_column_name(category, 'total'))
+            self.metrics[self.columns[-1]] = (category, 'total')
+            self.categories.append((category, index, total_index))
+
+        # Counters default to 0, top-level fields to empty
+        self.empty_row = [None] * len(base_fields) + [0] * (len(self.columns) - len(base_fields))
+
+    # Project one player stats response into a row in schema column order
+    def project(self, date, uid, player_info):
+        row = self.empty_row.copy()
+        row[self.date_index] = date
+        row[self.uid_index] = uid
+        for index, key in self.base:
+            row[index] = player_info.get(key)
+
+        for category, index, total_index in self.categories:
+            data = player_info.get(category)
+            # PHP sends an empty list instead of an empty object
+            if not isinstance(data, dict):
+                continue
+            total = 0
+            for key, value in data.items():
+                column = index.get(key)
+                if column is None:
+                    self.unknown[(category, key)] += 1
+                else:
+                    row[column] = value
+                total += value
+            row[total_index] = total
+        return row
+
+    # Function to write the keys seen in responses but missing from the schema
+    def write_unknown_report(self, path):
+        report = [{'category': category, 'key': key, 'players': count}
+                  for (category, key), count in self.unknown.most_common()]
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=2)
+        return report
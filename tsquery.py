@@ -0,0 +1,80 @@
+import argparse
+import sqlite3
+
+from sqlite_store import connect
+from stats_schema import StatsSchema
+from tsreader import to_date
+
+# Default location of the SQLite time-series store
+sqlite_file_path = './data/wbuserdata_ts.db'
+
+# Function to open the store for reading
+def open_store(path=sqlite_file_path):
+    return connect(path)
+
+# Function to find where a metric column lives: ('snapshots', None) for a
+# top-level field, or (category table, API key) for a counter
+def locate(metric, schema):
+    if metric in schema.metrics:
+        return schema.metrics[metric]
+    if metric in schema.columns and metric not in ('Date', 'UserID'):
+        return 'snapshots', None
+    raise KeyError(f"Unknown metric {metric!r}")
+
+# Per-player series of one metric as [(date, value)], oldest first. Counters
+# missing on a crawled date are 0. Uses the (UserID, Date) primary keys.
+def player_series(connection, uid, metric, start=None, end=None, schema=None):
+    table, key = locate(metric, schema or StatsSchema())
+    start = to_date(start).isoformat() if start else '0000-00-00'
+    end = to_date(end).isoformat() if end else '9999-99-99'
+    if key is None:
+        query = (f'SELECT Date, "{metric}" FROM snapshots '
+                 f'WHERE UserID = ? AND Date BETWEEN ? AND ? ORDER BY Date')
+        return connection.execute(query, (uid, start, end)).fetchall()
+    query = (f'SELECT s.Date, coalesce(c.value, 0) FROM snapshots s '
+             f'LEFT JOIN {table} c ON c.UserID = s.UserID AND c.Date = s.Date AND c.metric = ? '
+             f'WHERE s.UserID = ? AND s.Date BETWEEN ? AND ? ORDER BY s.Date')
+    return connection.execute(query, (key, uid, start, end)).fetchall()
+
+# Top `limit` players for one metric on one date as [(UserID, Name, value)].
+# Counters walk the (Date, metric, value) index backwards; ranked top-level
+# fields use their (Date, column) index.
+def leaderboard(connection, date, metric, limit=10, schema=None):
+    table, key = locate(metric, schema or StatsSchema())
+    date = to_date(date).isoformat()
+    if key is None:
+        query = (f'SELECT UserID, Name, "{metric}" FROM snapshots '
+                 f'WHERE Date = ? AND "{metric}" IS NOT NULL ORDER BY "{metric}" DESC LIMIT ?')
+        return connection.execute(query, (date, limit)).fetchall()
+    query = (f'SELECT c.UserID, s.Name, c.value FROM {table} c '
+             f'JOIN snapshots s ON s.UserID = c.UserID AND s.Date = c.Date '
+             f'WHERE c.Date = ? AND c.metric = ? ORDER BY c.value DESC LIMIT ?')
+    return connection.execute(query, (date, key, limit)).fetchall()
+
+# Function to list the crawl dates in the store
+def dates(connection):
+    return [date for date, in connection.execute('SELECT DISTINCT Date FROM snapshots ORDER BY Date')]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the SQLite time-series store")
+    parser.add_argument('--db', default=sqlite_file_path, help="path of the store")
+    commands = parser.add_subparsers(dest='command', required=True)
+    series = commands.add_parser('series', help="one player's values of a metric over time")
+    series.add_argument('uid')
+    series.add_argument('metric', help="column name, e.g. XP or Kills_Per_Weapon_ARRifle")
+    top = commands.add_parser('top', help="leaderboard of a metric on one crawl date")
+    top.add_argument('date', help="crawl date, e.g. 10182026")
+    top.add_argument('metric')
+    top.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        connection = open_store(args.db)
+        if args.command == 'series':
+            rows = player_series(connection, args.uid, args.metric)
+        else:
+            rows = leaderboard(connection, args.date, args.metric, args.limit)
+    except (KeyError, sqlite3.Error) as e:
+        parser.error(str(e))
+    for row in rows:
+        print(*row, sep='\t')
@@ -0,0 +1,208 @@
+import csv
+import glob
+import os
+from datetime import date, datetime
+
+import numpy as np
+
+from sinks import DATE_FORMAT, read_delta_log, string_columns, _to_number
+from stats_schema import StatsSchema
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Function to turn a crawl date ('10182026', a date or a datetime) into a date
+def to_date(value):
+    if value is None or isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+# Function to list the Parquet partitions under `root` whose date falls in [start, end]
+def parquet_partitions(root, start=None, end=None):
+    start, end = to_date(start), to_date(end)
+    partitions = []
+    for path in sorted(glob.glob(os.path.join(root, 'date=*'))):
+        day = datetime.strptime(os.path.basename(path)[len('date='):], '%Y-%m-%d').date()
+        if (start is None or day >= start) and (end is None or day <= end):
+            partitions.append((day, path))
+    return partitions
+
+# Load the time-series store written by the Parquet backend. Only the
+# partitions in the date range are opened and only `columns` are decoded, so
+# reading one metric for all players is a single-column scan.
+def read_parquet(root, columns=None, start=None, end=None):
+    if pq is None:
+        raise ImportError("pyarrow is required to read the Parquet store (pip install pyarrow)")
+    tables = []
+    for _, path in parquet_partitions(root, start, end):
+        for part in sorted(glob.glob(os.path.join(path, 'part-*.parquet'))):
+            tables.append(pq.read_table(part, columns=columns))
+    if not tables:
+        return None
+    return pa.concat_tables(tables)
+
+# Rebuild the full snapshot for `date` from a delta log: every player seen on
+# or before that date with its last known values, as rows in schema column order
+def read_delta_snapshot(path, date, schema=None):
+    schema = schema or StatsSchema()
+    target = to_date(date)
+    state = {}
+    for record in read_delta_log(path):
+        # The log is appended in crawl order, so stop at the first later date
+        if to_date(record['Date']) > target:
+            break
+        state.setdefault(record['UserID'], {}).update(record['changes'])
+
+    date_string = target.strftime(DATE_FORMAT)
+    rows = []
+    for uid, values in state.items():
+        row = [values.get(column, default) for column, default in zip(schema.columns, schema.empty_row)]
+        row[schema.date_index] = date_string
+        row[schema.uid_index] = uid
+        rows.append(row)
+    return rows
+
+# Rows held per batch by the streaming CSV reader
+DEFAULT_BATCH_ROWS = 65536
+
+# Function to turn one column of CSV cells into a typed NumPy array: text
+# columns stay strings, the rest become float64 with NaN for empty cells
+def column_array(column, values):
+    if column in string_columns:
+        return np.array(values, dtype=object)
+    try:
+        return np.array([value or 'nan' for value in values], dtype=np.float64)
+    except ValueError:
+        return np.array([_to_number(value) for value in values], dtype=np.float64)
+
+# Function to read every header line of a CSV, in file order. Header lines
+# are found with a byte search for lines starting with "Date," rather than by
+# parsing the rows, so this costs one read of the file.
+def csv_headers(path, block_size=1 << 22):
+    marker = b'\nDate,'
+    offsets = []
+    with open(path, 'rb') as file:
+        # `data` starts at byte `base`; a newline stands in before the first line
+        overlap, base = b'\n', -1
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            data = overlap + block
+            index = data.find(marker)
+            while index != -1:
+                offsets.append(base + index + 1)
+                index = data.find(marker, index + 1)
+            # Keep the end of the block in case a marker straddles two blocks
+            overlap = data[-(len(marker) - 1):]
+            base += len(data) - len(overlap)
+        headers = []
+        for offset in offsets:
+            file.seek(offset)
+            headers.append(next(csv.reader([file.readline().decode('utf-8', errors='replace')])))
+    return headers
+
+# Stream the time-series CSV and yield batches of at most `batch_rows` rows as
+# {column: NumPy array}, or as pyarrow record batches with `arrow`. Only the
+# requested `columns` (all when None) are kept, and only rows whose UserID is
+# in `uids` and whose Date falls in [start, end]. Memory stays bounded by one
+# batch however large the file is.
+#
+# The file is built by appending chunks, so a header line can appear again in
+# the middle; a repeat is skipped and a different one is used for the rows
+# after it, with columns it lacks left empty. A requested column only has to
+# be in one of the headers, so columns added by a later layout read as empty
+# in the rows under older ones. A file without a header is read in the
+# StatsSchema layout. With `unique` a (Date, UserID) pair appended
+# twice is only yielded the first time.
+def iter_csv_batches(path, columns=None, uids=None, start=None, end=None, batch_rows=DEFAULT_BATCH_ROWS,
+                     unique=False, arrow=False):
+    if arrow and pa is None:
+        raise ImportError("pyarrow is required for record batches (pip install pyarrow)")
+    start, end = to_date(start), to_date(end)
+    uids = set(uids) if uids is not None else None
+    in_range = {}
+    seen = set()
+
+    # Positions of the wanted columns (None when missing), Date and UserID in a header
+    def layout(header):
+        positions = {}
+        for index, name in enumerate(header):
+            positions.setdefault(name, index)
+        return [positions.get(column) for column in wanted], positions['Date'], positions['UserID']
+
+    def emit(cells):
+        arrays = {column: column_array(column, values) for column, values in zip(wanted, cells)}
+        return pa.RecordBatch.from_pydict(arrays) if arrow else arrays
+
+    with open(path, 'r', newline='') as file:
+        first = file.readline()
+        header = next(csv.reader([first]), None) if first.startswith('Date,') else None
+        if header is None:
+            header = StatsSchema().columns
+            file.seek(0)
+        wanted = list(columns or dict.fromkeys(header))
+        missing = [column for column in wanted if column not in header]
+        if missing:
+            # Look for them in the header lines further down
+            known = set().union(*csv_headers(path))
+            missing = [column for column in missing if column not in known]
+        if missing:
+            raise KeyError(f"Columns not in {path}: {', '.join(missing)}")
+        indexes, date_index, uid_index = layout(header)
+        cells, rows = [[] for _ in wanted], 0
+
+        for line in file:
+            # Cheap substring test before parsing the full row
+            if uids is not None and not line.startswith('Date,') and not any(uid in line for uid in uids):
+                continue
+            if date_index == 0 and (start is not None or end is not None) and not line.startswith('Date,'):
+                keep = in_range.get(line[:line.find(',')])
+                if keep is False:
+                    continue
+            row = next(csv.reader([line]), None)
+            if not row:
+                continue
+            if row[0] == 'Date':
+                if row != header:
+                    header = row
+                    indexes, date_index, uid_index = layout(header)
+                continue
+
+            uid, day = row[uid_index], row[date_index]
+            if uids is not None and uid not in uids:
+                continue
+            if start is not None or end is not None:
+                keep = in_range.get(day)
+                if keep is None:
+                    parsed = to_date(day)
+                    keep = in_range[day] = (start is None or parsed >= start) and (end is None or parsed <= end)
+                if not keep:
+                    continue
+            if unique:
+                if (day, uid) in seen:
+                    continue
+                seen.add((day, uid))
+
+            for values, index in zip(cells, indexes):
+                values.append(row[index] if index is not None and index < len(row) else '')
+            rows += 1
+            if rows >= batch_rows:
+                yield emit(cells)
+                cells, rows = [[] for _ in wanted], 0
+    if rows:
+        yield emit(cells)
+
+# Read the matching rows of the time-series CSV into one {column: NumPy array},
+# e.g. read_csv_columns(path, ['Date', 'UserID', 'KillsELO'], uids=some_uids)
+def read_csv_columns(path, columns=None, uids=None, start=None, end=None, unique=True):
+    batches = list(iter_csv_batches(path, columns, uids, start, end, unique=unique))
+    if not batches:
+        return {column: np.array([], dtype=object if column in string_columns else np.float64)
+                for column in columns or []}
+    return {column: np.concatenate([batch[column] for batch in batches]) for column in batches[0]}
@@ -0,0 +1,111 @@
+import os
+import struct
+from array import array
+from datetime import date
+
+# One fixed-size record per uid: the 12-byte ObjectId, then the first and
+# last dates it was seen as proleptic ordinals (0 when unknown)
+RECORD = struct.Struct('<12sII')
+
+# Function to pack a 24-hex ObjectId into its 12-byte key
+def uid_key(uid):
+    key = bytes.fromhex(uid)
+    if len(key) != 12:
+        raise ValueError(f"Not a 24-hex uid: {uid!r}")
+    return key
+
+# Registry of every uid ever seen, stored as 12-byte binary keys. New uids are
+# appended to the file in the order they are first seen, so a run only writes
+# the new records plus the last-seen dates it moved, in place; the record
+# positions never change. Iteration is in sorted uid order, which keeps the
+# crawl order stable from run to run.
+class UidRegistry:
+    def __init__(self, path):
+        self.path = path
+        self.index = {}
+        self.first = array('I')
+        self.last = array('I')
+        self.saved = 0
+        self.moved = set()
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as file:
+                data = file.read()
+            # Drop a partial record left behind by a crash mid-append
+            usable = len(data) - len(data) % RECORD.size
+            for key, first, last in RECORD.iter_unpack(data[:usable]):
+                self.index[key] = len(self.first)
+                self.first.append(first)
+                self.last.append(last)
+            if usable != len(data):
+                with open(self.path, 'rb+') as file:
+                    file.truncate(usable)
+        self.saved = len(self.first)
+        return self
+
+    # Seed the registry from a uniqueuids.txt file, with unknown first-seen dates
+    def import_text(self, path):
+        with open(path, 'r') as file:
+            for line in file:
+                uid = line.strip()
+                if uid:
+                    self.add(uid, None)
+        return self
+
+    # Record `uid` as seen on `day` (a date, or None when unknown); returns True if it is new
+    def add(self, uid, day=None):
+        key = uid_key(uid)
+        ordinal = day.toordinal() if day else 0
+        position = self.index.get(key)
+        if position is None:
+            self.index[key] = len(self.first)
+            self.first.append(ordinal)
+            self.last.append(ordinal)
+            return True
+        if ordinal > self.last[position]:
+            self.last[position] = ordinal
+            if self.first[position] == 0:
+                self.first[position] = ordinal
+            if position < self.saved:
+                self.moved.add(position)
+        return False
+
+    # Append the new records and rewrite the moved dates of existing ones in place
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        keys = list(self.index)
+        with open(self.path, 'rb+' if os.path.exists(self.path) else 'wb') as file:
+            for position in sorted(self.moved):
+                file.seek(position * RECORD.size)
+                file.write(RECORD.pack(keys[position], self.first[position], self.last[position]))
+            file.seek(self.saved * RECORD.size)
+            file.write(b''.join(RECORD.pack(keys[position], self.first[position], self.last[position])
+                                for position in range(self.saved, len(keys))))
+            file.truncate()
+        self.saved = len(keys)
+        self.moved.clear()
+
+    def first_seen(self, uid):
+        ordinal = self.first[self.index[uid_key(uid)]]
+        return date.fromordinal(ordinal) if ordinal else None
+
+    def last_seen(self, uid):
+        ordinal = self.last[self.index[uid_key(uid)]]
+        return date.fromordinal(ordinal) if ordinal else None
+
+    # Every uid as 24-hex strings, in sorted order
+    def uids(self):
+        return [key.hex() for key in sorted(self.index)]
+
+    def __contains__(self, uid):
+        try:
+            return uid_key(uid) in self.index
+        except ValueError:
+            return False
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.uids())
@@ -1,54 +1,66 @@
-import requests as re
-from bs4 import BeautifulSoup
+import argparse
 from tqdm import tqdm
-import pandas as pd
-import numpy as np
 from datetime import datetime
 import os
 
+from playerdb_store import long_file_path, migrate_wide_to_long, append_counts, update_wide, export_wide
+from ratsstats import make_session
+from squad_scraper import get_squad_names, scrape_squad_counts, DEFAULT_WORKERS, DEFAULT_RATE, cache_file_path, CACHE_ENTRIES
+from http_cache import HttpCache
+
 # Define the path to the CSV file
 csv_file_path = './data/playerdb.csv'
 
+# Function to scrape every squad page and record today's player counts
+def update_playerdb(workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, use_cache=True):
+    os.makedirs('./data', exist_ok=True)  # Ensures the directory exists
 
-os.makedirs('./data', exist_ok=True)  # Ensures the directory exists
+    # Seed the long store from the wide CSV the first time
+    migrate_wide_to_long(csv_file_path, long_file_path)
 
+    print('Obtaining list of squads and their player counts...')
+    session = make_session(pool_size=workers, accept='text/html')
+    squad_urls = get_squad_names(session)
 
-# Load or initialize the DataFrame
-if os.path.exists(csv_file_path):
-    playerdata = pd.read_csv(csv_file_path)
-else:
-    playerdata = pd.DataFrame(columns=['Squad'])
+    today = datetime.now()
 
-print('Obtaining list of squads and their player counts...')
-base_url = 'https://stats.warbrokers.io/squads'
-page = re.get(base_url)
-processed_page = BeautifulSoup(page.text, 'html.parser')
+    # Unchanged squad pages are answered from the on-disk cache
+    cache = HttpCache(cache_file_path, CACHE_ENTRIES).load() if use_cache else None
 
-squad_urls = [
-    url.replace('/squads/', '') 
-    for link in processed_page.find_all('a') 
-    if '/squads/' in str(link.get('href'))
-    for url in [str(link.get('href'))]
-]
+    # Collect every (squad, players) count first, scraping pages in parallel
+    results = {}
+    for squad, number_of_players, error in tqdm(scrape_squad_counts(squad_urls, workers, rate, session, cache),
+                                                total=len(squad_urls), desc="Processing"):
+        if error is not None:
+            print(f"Error processing squad {squad}: {error}")
+            continue
+        results[squad] = number_of_players
+    session.close()
 
-squad_urls = tqdm(squad_urls, desc="Processing")
+    if cache is not None:
+        cache.save()
+        print(f"Squad page cache: {cache.hits} unchanged, {cache.misses} parsed")
 
-for squad in squad_urls:
-    page = re.get(base_url + '/' + squad)
-    processed_page = BeautifulSoup(page.text, 'html.parser')
-    number_of_players = len([
-        link 
-        for link in processed_page.find_all('a') 
-        if '/players/i/' in str(link.get('href'))
-    ])
+    # Keep the squad list's order so new squads are added in page order
+    counts = [(squad, results[squad]) for squad in squad_urls if squad in results]
 
-    # Update the DataFrame
-    if squad in playerdata['Squad'].values:
-        playerdata.loc[playerdata['Squad'] == squad, datetime.now().strftime('%m/%d/%Y')] = number_of_players
-    else:
-        row_data = [squad] + [np.nan] * (len(playerdata.columns) - 1)
-        new_row = pd.DataFrame([row_data], columns=playerdata.columns)
-        playerdata = pd.concat([playerdata, new_row], ignore_index=True)
-        playerdata.loc[playerdata['Squad'] == squad, datetime.now().strftime('%m/%d/%Y')] = number_of_players
+    # Then apply them in one batch to the long store and one step to the wide CSV
+    append_counts(today, counts, long_file_path)
+    update_wide(csv_file_path, today, counts)
 
-playerdata.to_csv(csv_file_path, index=False)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track squad player counts over time")
+    parser.add_argument('--export', action='store_true',
+                        help="rebuild the wide playerdb.csv from the long store instead of scraping")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="number of squad pages fetched at once (env: PLAYERDB_WORKERS)")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help="maximum requests per second, 0 for no limit (env: PLAYERDB_RATE)")
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help="download and parse every squad page, ignoring the page cache")
+    args = parser.parse_args()
+
+    if args.export:
+        export_wide(csv_file_path, long_file_path)
+    else:
+        update_playerdb(workers=args.workers, rate=args.rate, use_cache=args.use_cache)